@@ -0,0 +1,72 @@
+"""
+Benchmark desk rendering at several workspace resolutions.
+
+Compares the skeleton-based render_desk with the original per-cell
+string-building renderer. Run from the repository root:
+
+    python -m benchmarks.bench_desk
+"""
+import random
+import timeit
+import argparse
+
+from service.grid import GridSpec, desk_skeleton
+from service.scene import COLORS, OBJECTS, Scene, render_desk
+
+GRID_SPECS = [GridSpec(100, 25), GridSpec(200, 50), GridSpec(400, 100), GridSpec(400, 200)]
+
+
+def render_desk_per_cell(scene, spec):
+    """Reference renderer visiting every cell, as tokenize_desk originally did."""
+    grid = {}
+    for obj in scene.objects:
+        row, col, local_row, local_col = spec.discretize(obj.x, obj.y)
+        grid[(row, col)] = (obj.token, local_row, local_col)
+    tokenized_desk = "<desk>\n"
+    for row in range(spec.grid_size):
+        for col in range(spec.grid_size):
+            cell = grid.get((row, col))
+            if cell is not None:
+                token, local_row, local_col = cell
+                tokenized_desk += f"<|{row}-{col}|><|local-{local_row}-{local_col}|>{token}"
+            else:
+                tokenized_desk += f"<|{row}-{col}|><|empty|>"
+        tokenized_desk += "\n"
+    tokenized_desk += "</desk>"
+    return tokenized_desk, scene.heights_json()
+
+
+def random_scene(spec, num_objects, rng):
+    scene = Scene()
+    for i in range(num_objects):
+        color = COLORS[i % len(COLORS)]
+        object_type = OBJECTS[i // len(COLORS) % len(OBJECTS)]
+        scene.add(color, object_type, rng.randrange(spec.workspace), rng.randrange(spec.workspace), rng.randint(1, 30))
+    return scene
+
+
+def time_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark desk rendering.')
+    parser.add_argument('--objects', type=int, nargs='+', default=[6, 50], help='Number of objects per scene')
+    parser.add_argument('--number', type=int, default=20, help='Calls per timing')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'grid':>12} {'objects':>8} {'per-cell us':>12} {'skeleton us':>12} {'speedup':>8}")
+    for spec in GRID_SPECS:
+        desk_skeleton(spec)  # built once per spec, outside the timed region
+        for num_objects in args.objects:
+            scene = random_scene(spec, num_objects, rng)
+            assert render_desk(scene, spec) == render_desk_per_cell(scene, spec)
+            per_cell = time_call(lambda: render_desk_per_cell(scene, spec), args.number)
+            skeleton = time_call(lambda: render_desk(scene, spec), args.number)
+            label = f"{spec.workspace}/{spec.grid_size}"
+            print(f"{label:>12} {num_objects:>8} {per_cell * 1e6:>12.1f} {skeleton * 1e6:>12.1f} {per_cell / skeleton:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark per-request CPU time and payload size of the API wire formats.
+
+Drives the FastAPI app in-process with the stub engine (no GPU, no sockets)
+and compares JSON and msgpack, with and without the reasoning text. Run from
+the repository root:
+
+    python -m benchmarks.bench_wire
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import asyncio
+import argparse
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service"))
+
+import httpx
+from pydantic import BaseModel
+
+import api
+import wire
+from grid import parse_and_convert
+from stub_engine import create_stub_engine, stub_answer
+
+TASK = {
+    "instruction": "Stack the black cube on top of the red cube",
+    "objects": [
+        {"red-cube": [51, 43, 17]},
+        {"black-cube": [44, 58, 17]},
+        {"purple-cube": [74, 59, 17]},
+        {"green-cube": [65, 82, 17]},
+    ],
+}
+
+VARIANTS = [
+    ("json", wire.JSON, True),
+    ("json, no raw", wire.JSON, False),
+    ("msgpack", wire.MSGPACK, True),
+    ("msgpack, no raw", wire.MSGPACK, False),
+]
+
+
+class LegacyRobotTaskRequest(BaseModel):
+    """The request model before Scene validation, for comparison."""
+    instruction: str
+    objects: List[Dict[str, List[int]]]
+
+
+def codec_benchmarks(number):
+    """Time decode + validate + encode alone, without HTTP or the engine."""
+    raw_output = stub_answer(api.render_desk(api.Scene.from_json(TASK["objects"]))[0])
+    result = {"actions": parse_and_convert(raw_output), "raw_output": raw_output, "consensus": None}
+    json_body = json.dumps(TASK).encode()
+
+    def legacy():
+        request = LegacyRobotTaskRequest(**json.loads(json_body))
+        api.Scene.from_json(request.objects)
+        return api.RobotTaskResponse(**result).model_dump_json()
+
+    def fast(media, include_raw):
+        body = wire.encode(dict(TASK, include_raw=include_raw), media)
+
+        def run():
+            task = api.RobotTaskRequest.model_validate(wire.decode(body, media))
+            return wire.encode(api.select_fields(result, task.fields, task.include_raw), media)
+        return run
+
+    variants = [("pydantic + json", legacy)] + [
+        (label, fast(media, include_raw))
+        for label, media, include_raw in VARIANTS
+        if media != wire.MSGPACK or wire.msgpack is not None
+    ]
+    print(f"{'codec':>16} {'us/req':>8}")
+    for label, func in variants:
+        seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{label:>16} {seconds * 1e6:>8.1f}")
+    print()
+
+
+async def run_variant(client, media, include_raw, num_requests, concurrency):
+    payload = dict(TASK, include_raw=include_raw)
+    body = wire.encode(payload, media)
+    headers = {"content-type": media, "accept": media}
+    semaphore = asyncio.Semaphore(concurrency)
+    response_bytes = 0
+
+    async def one():
+        nonlocal response_bytes
+        async with semaphore:
+            response = await client.post("/robot/task", content=body, headers=headers)
+            response.raise_for_status()
+            response_bytes += len(response.content)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(num_requests)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return cpu / num_requests, num_requests / wall, len(body), response_bytes / num_requests
+
+
+async def main_async(args):
+    await api.initialize(engine_factory=create_stub_engine, warmup_requests=0,
+                         max_concurrent_requests=args.concurrency)
+    transport = httpx.ASGITransport(app=api.app)
+    print(f"orjson: {'yes' if wire.orjson else 'no'}, msgpack: {'yes' if wire.msgpack else 'no'}\n")
+    codec_benchmarks(args.number)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'variant':>16} {'cpu us/req':>11} {'req/s':>8} {'req bytes':>10} {'resp bytes':>11}")
+        for label, media, include_raw in VARIANTS:
+            if media == wire.MSGPACK and wire.msgpack is None:
+                continue
+            await run_variant(client, media, include_raw, args.concurrency, args.concurrency)  # warm up
+            cpu, rps, request_bytes, response_bytes = await run_variant(client, media, include_raw, args.requests, args.concurrency)
+            print(f"{label:>16} {cpu * 1e6:>11.0f} {rps:>8.0f} {request_bytes:>10} {response_bytes:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API wire formats with the stub engine.')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per variant')
+    parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight')
+    parser.add_argument('--number', type=int, default=2000, help='Calls per codec timing')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Run the benchmark suite, store the results per commit and flag regressions.
+
+Results go to benchmarks/results/<machine>/<commit>.json so that only runs
+from the same machine are compared. Everything runs on a CPU-only box; the
+API benchmarks use the stub engine and are skipped when the service
+dependencies (fastapi, httpx) are not installed. Run from the repository root:
+
+    python -m benchmarks.run                      # run, save, compare with the previous commit's results
+    python -m benchmarks.run --baseline main      # compare with the results stored for another commit
+    python -m benchmarks.run --filter render_desk --no-save
+
+Exits with status 1 when a benchmark got slower than the baseline by more
+than --threshold.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import timeit
+import platform
+import argparse
+import subprocess
+
+from benchmarks.suite import BENCHMARKS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_commit():
+    """Return HEAD's hash, with a -dirty suffix when the working tree has changes."""
+    commit = git("rev-parse", "HEAD") or "unknown"
+    if git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+    return commit
+
+
+def time_benchmark(bench, repeat, min_time):
+    """
+    Time one benchmark.
+
+    The call count per repeat is calibrated so that a repeat takes at least
+    min_time seconds; the best repeat is reported, which is the least noisy
+    estimate on a shared machine.
+
+    Returns:
+        Dictionary with seconds per item and the number of calls per repeat
+    """
+    func = bench.setup() if bench.param is None else bench.setup(bench.param)
+    func()  # warm caches outside the timed region
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number))
+    return {"seconds": best / number / bench.items, "number": number, "items": bench.items}
+
+
+def run_suite(names, repeat, min_time):
+    results = {}
+    for name in names:
+        try:
+            results[name] = time_benchmark(BENCHMARKS[name], repeat, min_time)
+        except ImportError as e:
+            print(f"{name:<40} skipped ({e})")
+            continue
+        print(f"{name:<40} {format_seconds(results[name]['seconds']):>12}")
+    return results
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def results_path(machine, commit):
+    return os.path.join(RESULTS_DIR, machine, f"{commit}.json")
+
+
+def save_results(machine, commit, results):
+    path = results_path(machine, commit)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {
+        "commit": commit,
+        "machine": machine,
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_baseline(machine, commit, baseline=None):
+    """
+    Locate the results to compare against.
+
+    Args:
+        machine: Machine name the results were stored under
+        commit: Commit of the current run, never used as its own baseline
+        baseline: Results file, or a commit-ish resolved with git; by default
+                  the results of the nearest ancestor commit that has them
+
+    Returns:
+        Path of the baseline results, or None if there are none
+    """
+    if baseline is not None:
+        if os.path.exists(baseline):
+            return baseline
+        resolved = git("rev-parse", baseline)
+        path = results_path(machine, resolved or baseline)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No stored results for {baseline} on {machine}")
+        return path
+    stored = {os.path.basename(path)[:-len(".json")]: path
+              for path in glob.glob(os.path.join(RESULTS_DIR, machine, "*.json"))}
+    ancestors = (git("rev-list", "--max-count=200", "HEAD") or "").split()
+    for ancestor in ancestors:
+        if ancestor in stored and ancestor != commit:
+            return stored[ancestor]
+    return None
+
+
+def compare(baseline, results, threshold):
+    """
+    Print a comparison table and return the names of regressed benchmarks.
+
+    A benchmark regresses when its time per item grew by more than threshold
+    (0.15 = 15%) relative to the baseline.
+    """
+    regressions = []
+    print(f"\nCompared with {baseline['commit'][:12]} (threshold {threshold:.0%}):")
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>12} {format_seconds(result['seconds']):>12} {'new':>7}")
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "  faster"
+        print(f"{name:<40} {format_seconds(previous['seconds']):>12} {format_seconds(result['seconds']):>12} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite and compare with stored results.')
+    parser.add_argument('--filter', type=str, nargs='*', default=None, help='Only run benchmarks whose name contains one of these')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repeats per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per repeat')
+    parser.add_argument('--baseline', type=str, default=None, help='Commit-ish or results file to compare with (default: nearest ancestor with results)')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Relative slowdown reported as a regression')
+    parser.add_argument('--machine', type=str, default=platform.node() or "local", help='Machine name to store and compare results under')
+    parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.filter or any(part in name for part in args.filter)]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    commit = current_commit()
+    # Loaded up front: the baseline may be this commit's own previous run, which saving overwrites
+    baseline_path = find_baseline(args.machine, commit, args.baseline)
+    baseline = load_results(baseline_path) if baseline_path is not None else None
+    print(f"Benchmarking {commit[:12]} on {args.machine} (Python {platform.python_version()})\n")
+    results = run_suite(names, args.repeat, args.min_time)
+    if not args.no_save:
+        print(f"\nSaved results to {save_results(args.machine, commit, results)}")
+
+    if baseline is None:
+        print("\nNo baseline results to compare with")
+        return
+    regressions = compare(baseline, results, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
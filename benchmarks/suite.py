@@ -0,0 +1,126 @@
+"""
+Benchmarks tracked per commit by benchmarks/run.py.
+
+Every benchmark is a setup function registered with @benchmark. It is called
+once per parameter, outside the timed region, and returns the callable to
+time. `items` is the number of units (samples, requests) one call processes,
+so throughput benchmarks report time per unit.
+"""
+import json
+import random
+import asyncio
+import tempfile
+from collections import namedtuple
+
+from service.grid import GridSpec, parse_and_convert
+from service.scene import render_desk
+from benchmarks.bench_desk import random_scene
+
+Benchmark = namedtuple("Benchmark", ["name", "setup", "param", "items"])
+
+BENCHMARKS = {}
+
+# (workspace, grid_size, objects) scene sizes
+SCENE_SIZES = [(100, 25, 6), (100, 25, 50), (200, 50, 50), (400, 100, 200)]
+
+
+def benchmark(name, params=(None,), items=1):
+    """Register a setup function once per parameter as name[param]."""
+    def register(setup):
+        for param in params:
+            key = name if param is None else f"{name}[{format_param(param)}]"
+            BENCHMARKS[key] = Benchmark(key, setup, param, items)
+        return setup
+    return register
+
+
+def format_param(param):
+    if isinstance(param, tuple):
+        return "/".join(str(value) for value in param)
+    return str(param)
+
+
+@benchmark("render_desk", params=SCENE_SIZES)
+def render_desk_scene(param):
+    workspace, grid_size, num_objects = param
+    spec = GridSpec(workspace, grid_size)
+    scene = random_scene(spec, num_objects, random.Random(0))
+    return lambda: render_desk(scene, spec)
+
+
+@benchmark("tokenize_desk", params=SCENE_SIZES)
+def tokenize_desk_json(param):
+    from utils import tokenize_desk
+
+    workspace, grid_size, num_objects = param
+    spec = GridSpec(workspace, grid_size)
+    objects_des = random_scene(spec, num_objects, random.Random(0)).to_json()
+    return lambda: tokenize_desk(objects_des, spec=spec)
+
+
+@benchmark("generate_task", params=["placing", "stacking", "move", "unique_placing", "unique_stacking", "episode"])
+def generate_task(task):
+    from synthetic_data_pick_place import TASK_GENERATORS
+
+    random.seed(0)
+    generator = TASK_GENERATORS[task]
+    return generator
+
+
+@benchmark("convert_solution", params=[(100, 25), (400, 100)])
+def convert_solution(param):
+    from synthetic_data_pick_place import convert_solution
+
+    spec = GridSpec(*param)
+    rng = random.Random(0)
+    actions = [[rng.randrange(spec.workspace), rng.randrange(spec.workspace), rng.randint(0, 30), 0, 60, 90, i % 2]
+               for i in range(7)]
+    return lambda: convert_solution(actions, spec=spec)
+
+
+@benchmark("parse_and_convert", params=[(100, 25), (400, 100)])
+def parse_and_convert_output(param):
+    from synthetic_data_pick_place import generate_task
+
+    spec = GridSpec(*param)
+    random.seed(0)
+    output_text = generate_task("stacking", spec)["Conversation"][1]["content"]
+    return lambda: parse_and_convert(output_text, spec)
+
+
+@benchmark("generate_shard", items=500)
+def generate_shard():
+    """End-to-end generation throughput: mixed tasks streamed into a shard file."""
+    from shards import write_shard
+    from synthetic_data_pick_place import build_task_counts, generate_shard, plan_shards
+
+    counts = plan_shards(build_task_counts(100000, 120000, 40000, 70000, 30000), 500)[0]
+
+    def run():
+        # Created and removed per call so that repeated runs leave nothing behind
+        with tempfile.TemporaryDirectory(prefix="bench-shard-") as output_dir:
+            write_shard(output_dir, 0, generate_shard(counts, 0))
+    return run
+
+
+@benchmark("api_robot_task", params=[1, 4], items=64)
+def api_robot_task(n):
+    """Stub-engine API throughput: 64 concurrent /robot/task requests with n completions each."""
+    import httpx
+    from benchmarks.bench_wire import TASK, api
+    from stub_engine import create_stub_engine
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(api.initialize(engine_factory=create_stub_engine, warmup_requests=0,
+                                           max_concurrent_requests=64))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench")
+    body = json.dumps(dict(TASK, n=n)).encode()
+    headers = {"content-type": "application/json"}
+
+    async def post():
+        response = await client.post("/robot/task", content=body, headers=headers)
+        response.raise_for_status()
+
+    async def batch():
+        await asyncio.gather(*(post() for _ in range(64)))
+    return lambda: loop.run_until_complete(batch())
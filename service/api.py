@@ -1,20 +1,25 @@
-import re
 import json
+import time
+import uuid
+import secrets
 import asyncio
+from functools import partial
 from typing import List, Dict, Any, Optional
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 import logging
 
 from fastapi import FastAPI, Request, BackgroundTasks
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-
-from vllm.engine.arg_utils import AsyncEngineArgs
-from vllm.engine.async_llm_engine import AsyncLLMEngine
-from vllm.sampling_params import SamplingParams
-from vllm.utils import random_uuid
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
 import copy
 
+from grid import DEFAULT_GRID, GridSpec, parse_and_convert
+from scene import Scene, render_desk
+from voting import action_key, vote_actions
+import wire
+from tracing import RequestTrace, SlowRequestLog, format_folded, sample_stacks
+from traffic import TrafficRecorder
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,47 +27,157 @@ logging.basicConfig(
 )
 logger = logging.getLogger("robot-reasoning-api")
 
+_process_start = time.perf_counter()
+
 # Global variables
 engine = None
+# Sampling parameters class of the engine in use (vLLM's or the stub's)
+SamplingParams = None
+# Workspace resolution the model was trained on
+grid_spec = DEFAULT_GRID
 # Semaphore to limit concurrent requests
 request_semaphore = None
+# Startup configuration; start_server() fills it in, `uvicorn api:app` uses these defaults
+server_config = {
+    "model_path": "homebrewltd/AlphaSpace-1.5B",
+    "max_concurrent_requests": 10,
+    "spec": DEFAULT_GRID,
+    "warmup_requests": 2,
+    "warmup_file": None,
+    "engine_factory": None,
+}
+# Startup progress and per-phase durations in seconds, reported by /health/ready
+startup_state = {"phase": "starting", "timings": {}, "error": None}
+startup_task = None
+# Slowest requests with per-stage timings, served by /admin/slow_requests
+slow_log = SlowRequestLog(50)
+# Bearer token for the /admin endpoints; they are disabled while it is None
+admin_token = None
+# Event loop lag seen by loop_lag_monitor, in seconds
+loop_lag = {"last": 0.0, "max": 0.0}
+loop_lag_task = None
+profile_lock = asyncio.Lock()
+# Opt-in capture of sampled requests for replay (--record-dir)
+recorder_config = None
+recorder = None
+MAX_PROFILE_SECONDS = 60.0
+
+# Representative tasks replayed through the full request path during warmup
+WARMUP_TASKS = [
+    {
+        "instruction": "Stack the black cube on top of the red cube",
+        "objects": [
+            {"red-cube": [51, 43, 17]},
+            {"black-cube": [44, 58, 17]},
+            {"purple-cube": [74, 59, 17]},
+            {"green-cube": [65, 82, 17]},
+        ],
+    },
+    {
+        "instruction": "Pick up the yellow star and place it into the blue container",
+        "objects": [
+            {"yellow-star": [12, 80, 9]},
+            {"blue-container": [76, 65, 17]},
+            {"red-container": [30, 20, 14]},
+            {"purple-triangular prism": [51, 55, 18]},
+            {"green-moon": [88, 7, 6]},
+        ],
+    },
+    {
+        "instruction": "Move the cyan cylinder to [20, 30, 12]",
+        "objects": [
+            {"cyan-cylinder": [60, 61, 22]},
+            {"white-cube": [5, 95, 11]},
+            {"olive-star": [40, 10, 3]},
+            {"navy-moon": [93, 44, 27]},
+        ],
+    },
+]
 
 # Lifecycle management for FastAPI
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: nothing to do here since engine is initialized separately
+    # Startup: load and warm up the engine in the background so that the server
+    # answers /health/live right away and /health/ready once it can take traffic
+    global startup_task, loop_lag_task, recorder
+    startup_state["timings"]["boot"] = time.perf_counter() - _process_start
+    startup_task = asyncio.create_task(run_startup())
+    loop_lag_task = asyncio.create_task(loop_lag_monitor())
+    if recorder_config is not None:
+        recorder = TrafficRecorder(**recorder_config)
+        recorder.start()
+        logger.info(f"Recording {recorder.sample_rate:.0%} of requests to {recorder.directory}")
     yield
     # Shutdown: clean up resources
     global engine
-    if engine is not None:
+    if not startup_task.done():
+        startup_task.cancel()
+    loop_lag_task.cancel()
+    if recorder is not None:
+        await recorder.close()
+        logger.info(f"Traffic capture: {recorder.stats}")
+        recorder = None
+    if engine is not None and hasattr(engine, "unload_model"):
         logger.info("Shutting down LLM engine")
         await engine.unload_model()
 
 app = FastAPI(title="Robot Reasoning API", lifespan=lifespan)
 
+RESPONSE_FIELDS = ("actions", "raw_output", "consensus")
+
 class RobotTaskRequest(BaseModel):
     instruction: str
-    objects: List[Dict[str, List[int]]]
+    objects: Scene  # Accepts the [{"color-object": [x, y, z]}, ...] JSON shape
     # grid_size: int = 25
+    # Best-of-N: completions sampled in one engine call and voted on
+    n: int = Field(1, ge=1, le=16)
+    # Stop sampling once this many completions agree on the same actions
+    early_stop_k: Optional[int] = Field(None, ge=2)
+    # Response fields to return; the reasoning text is often not needed by controllers
+    fields: Optional[List[str]] = None
+    include_raw: bool = True
+
+    @field_validator("objects")
+    @classmethod
+    def objects_on_desk(cls, objects: Scene) -> Scene:
+        # Off-desk positions cannot be rendered; reject them rather than prompt with a wrong desk
+        return objects.check_bounds(grid_spec.workspace)
+
+    @field_validator("fields")
+    @classmethod
+    def known_fields(cls, fields: Optional[List[str]]) -> Optional[List[str]]:
+        # A typo would otherwise silently select nothing and return an empty object
+        unknown = [name for name in fields or () if name not in RESPONSE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown response fields {unknown}, expected some of {list(RESPONSE_FIELDS)}")
+        return fields
+
+    @model_validator(mode="after")
+    def early_stop_within_n(self) -> "RobotTaskRequest":
+        # k agreeing completions can never be reached with fewer than k samples
+        if self.early_stop_k is not None and self.early_stop_k > self.n:
+            raise ValueError(f"early_stop_k ({self.early_stop_k}) must not exceed n ({self.n})")
+        return self
 
 class RobotTaskResponse(BaseModel):
     actions: List[List[int]]  # List of [x, y, z, roll, pitch, yaw, gripper]
     raw_output: str
+    consensus: Optional[Dict[str, Any]] = None  # Agreement stats when n > 1
 
 # Template for system prompt
-SYSTEM_PROMPT="""You are a spatial reasoning assistant for a Franka Panda robot with a parallel gripper. Your task is to generate precise action sequences to accomplish object manipulation tasks.
+SYSTEM_PROMPT_TEMPLATE="""You are a spatial reasoning assistant for a Franka Panda robot with a parallel gripper. Your task is to generate precise action sequences to accomplish object manipulation tasks.
 
 ## INPUT ENVIRONMENT:
-- The workspace is a table surface represented as a 100x100 discrete grid, divided into a 25x25 grid of larger cells.
+- The workspace is a table surface represented as a {workspace}x{workspace} discrete grid, divided into a {grid_size}x{grid_size} grid of larger cells.
 - Global positions are denoted by <|row-col|> tokens (e.g., <|3-12|>)
 - When objects exist within a grid cell, their positions are further specified with <|local-row-col|> tokens (e.g., <|local-0-3|>)
-- Local positions are in the range 0-3 for both row and column, representing positions in a 4x4 grid within each global cell
+- Local positions are in the range 0-{local_max} for both row and column, representing positions in a {local_size}x{local_size} grid within each global cell
 - Objects are represented as <|color|><|object|> tokens (e.g., <|red|><|cube|>) while <|empty|> means empty space
 - Example: An object at <|5-10|><|2-3|><|red|><|cube|> is a red cube in the global cell at row 5, column 10, and within that cell, at local position row 2, column 3
 - The height of each object: {object_height}
 
 ## IMPORTANT INSTRUCTIONS:
-- Each output action is represented as a 7D discrete gripper action in the following format: ["<|row-col|>", "<|local-row-col|>", Z, Roll, Pitch, Yaw, Gripper] with <|row-col|> as the global position in the 25x25 grid, <|local-row-col|> as the local position within the 4x4 grid of that cell, Z is the height from Gripper Tip to Table surface.
+- Each output action is represented as a 7D discrete gripper action in the following format: ["<|row-col|>", "<|local-row-col|>", Z, Roll, Pitch, Yaw, Gripper] with <|row-col|> as the global position in the {grid_size}x{grid_size} grid, <|local-row-col|> as the local position within the {local_size}x{local_size} grid of that cell, Z is the height from Gripper Tip to Table surface.
 - Gripper state is 0 for close and 1 for open.
 - The allowed range of Z is [0, 100].
 - Roll, Pitch, and Yaw are the 3D discrete orientations of the gripper in the environment, represented as discrete
@@ -78,211 +193,393 @@ Think step by step about the spatial relationships and analyze the desk map to l
 Then output ONLY the action sequence in the required format.
 """
 
-def tokenize_desk(objects_des, grid_size=25):
-    """
-    Convert object positions into a tokenized desk representation with global and local positions
-    
-    Args:
-        objects_des: List of dictionaries, each containing an object name and its [x,y,z] coordinates
-                 The coordinates are in a 100x100 range
-        grid_size: The size of the global grid (default: 25x25)
-        
-    Returns:
-        A string containing the tokenized desk representation
-    """
-    grid = {}
-    object_height = {}
-    num_local_grid = 100//grid_size 
-    for obj_dict in objects_des:
-        for obj_name, coords in obj_dict.items():
-            x, y, z = coords
-            
-            global_x = min(grid_size - 1, x // num_local_grid)
-            global_y = min(grid_size - 1, y // num_local_grid)
-            local_x = x % num_local_grid
-            local_y = y % num_local_grid
-            
-            parts = obj_name.split("-")
-            color = parts[0].strip()
-            object_type = parts[1].strip()
-            position = (global_x, global_y)
-            grid[position] = (color, object_type, local_x, local_y)
-            object_des = f"<|{color}|><|{object_type}|>"
-            object_height[object_des] = z
-    object_height = json.dumps(object_height)
-    tokenized_desk = "<desk>\n"
-    
-    for row in range(grid_size):
-        for col in range(grid_size):
-            position = (row, col)
-            if position in grid:
-                color, object_type, local_row, local_col = grid[position]
-                tokenized_desk += f"<|{row}-{col}|><|local-{local_row}-{local_col}|><|{color}|><|{object_type}|>"
-            else:
-                tokenized_desk += f"<|{row}-{col}|><|empty|>"
-        tokenized_desk += "\n"
-    
-    tokenized_desk += "</desk>"
-    return tokenized_desk, object_height
+def is_ready() -> bool:
+    return startup_state["phase"] == "ready"
 
-def parse_and_convert(output_text: str) -> List[List[int]]:
-    """
-    Parse the model output and convert to 100x100 space, returning a list of action arrays
-    
-    Args:
-        output_text: The full output text from the model
-        
-    Returns:
-        List of action arrays in 100x100 space format [x, y, z, roll, pitch, yaw, gripper]
-    """
-    step_pattern = r'Step \d+: \["<\|(\d+)-(\d+)\|>", "<\|local-(\d+)-(\d+)\|>", (\d+), (\d+), (\d+), (\d+), (\d+)\]'
-    matches = re.findall(step_pattern, output_text)
-    
-    action_sequences = []
-    for match in matches:
-        row, col, local_row, local_col, z, roll, pitch, yaw, gripper = map(int, match)
-        
-        # Convert from 25x25 to 100x100 space
-        x_100 = row * 4 + local_row
-        y_100 = col * 4 + local_col
-        
-        action = [x_100, y_100, z, roll, pitch, yaw, gripper]
-        action_sequences.append(action)
-    
-    return action_sequences
+@app.get("/health/live")
+async def health_live():
+    """Liveness check: the process is up and serving HTTP."""
+    return {"status": "alive"}
 
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness check: the engine is loaded and warmed up."""
+    body = {"status": startup_state["phase"], "startup_seconds": startup_state["timings"]}
+    if startup_state["error"] is not None:
+        body["error"] = startup_state["error"]
+    if not is_ready():
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 @app.get("/health")
 async def health():
     """Health check."""
-    global engine
-    if engine is None:
+    if startup_state["phase"] == "failed":
+        return {"status": "failed"}
+    if not is_ready():
         return {"status": "initializing"}
     return {"status": "healthy"}
 
-async def process_robot_task(request: RobotTaskRequest) -> Dict:
+async def loop_lag_monitor(interval: float = 0.1):
+    """Measure how late the event loop wakes up, to tell loop stalls apart from slow stages"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        loop_lag["last"] = lag
+        loop_lag["max"] = max(loop_lag["max"], lag)
+
+async def process_robot_task(request: RobotTaskRequest, trace: Optional[RequestTrace] = None) -> Dict:
     """
     Process the robot task in a separate function to handle concurrency
     """
-    global engine, request_semaphore
+    global engine, request_semaphore, grid_spec
     
+    if trace is None:
+        trace = RequestTrace(uuid.uuid4().hex)
     try:
         # Acquire semaphore to limit concurrent requests
         async with request_semaphore:
+            trace.mark("queue")
             # Format the input using the prompt template
-            print(request.objects)
-            desk, object_height = tokenize_desk(request.objects)
-            prompt = SYSTEM_PROMPT.format(
+            logger.debug(f"[{trace.trace_id}] Scene: {request.objects}")
+            desk, object_height = render_desk(request.objects, grid_spec)
+            prompt = grid_spec.fill(SYSTEM_PROMPT_TEMPLATE).format(
                 object_height=object_height,
                 instruction=request.instruction,
                 TABLE_MAP=desk
             )
+            trace.info["prompt_chars"] = len(prompt)
+            trace.mark("prompt")
             
-            # Create sampling parameters
+            # Create sampling parameters; the n completions share one prefill
             sampling_params = SamplingParams(
+                n=request.n,
                 temperature=0.6,
                 max_tokens=4096,
             )
             
-            # Generate using the async engine
-            request_id = random_uuid()
+            # Generate using the async engine. The engine id is always fresh: the trace id
+            # may come from the client and is not unique among in-flight requests
+            request_id = uuid.uuid4().hex
+            trace.info["engine_request_id"] = request_id
             results_generator = engine.generate(prompt, sampling_params, request_id)
             
-            # Collect the final result (non-streaming)
-            final_output = None
+            # Parse each completion as soon as it finishes
+            texts = {}
+            parsed = {}
+            votes = {}
+            early_stopped = False
+            output_tokens = 0
             async for request_output in results_generator:
-                final_output = request_output
+                trace.mark("engine")
+                for completion in request_output.outputs:
+                    if completion.finish_reason is None or completion.index in parsed:
+                        continue
+                    texts[completion.index] = completion.text
+                    output_tokens += len(completion.token_ids)
+                    parsed[completion.index] = parse_and_convert(completion.text, grid_spec)
+                    key = action_key(parsed[completion.index])
+                    votes[key] = votes.get(key, 0) + 1
+                    if request.early_stop_k and key and votes[key] >= request.early_stop_k:
+                        early_stopped = True
+                prompt_token_ids = getattr(request_output, "prompt_token_ids", None)
+                if prompt_token_ids is not None:
+                    trace.info["prompt_tokens"] = len(prompt_token_ids)
+                trace.mark("parse")
+                if early_stopped:
+                    await engine.abort(request_id)
+                    break
+            trace.mark("engine")
+            trace.info["output_tokens"] = output_tokens
         
-            if final_output is None:
+            if not parsed:
                 logger.error("Failed to generate output")
                 return {"error": "Failed to generate output"}
-                
-            output_text = final_output.outputs[0].text
-            discrete_actions = parse_and_convert(output_text)
             
+            if request.n == 1:
+                return {
+                    "actions": parsed[0],
+                    "raw_output": texts[0]
+                }
+            
+            indices = sorted(parsed)
+            chosen, discrete_actions, consensus = vote_actions([parsed[i] for i in indices])
+            consensus["n"] = request.n
+            consensus["early_stopped"] = early_stopped
+            trace.mark("vote")
             return {
                 "actions": discrete_actions,
-                "raw_output": output_text
+                "raw_output": texts[indices[chosen]],
+                "consensus": consensus
             }
     
     except Exception as e:
-        logger.error(f"Error processing robot task: {str(e)}")
+        logger.error(f"[{trace.trace_id}] Error processing robot task: {str(e)}")
         return {"error": str(e)}
 
-@app.post("/robot/task")
-async def robot_task(request: RobotTaskRequest, background_tasks: BackgroundTasks):
-    """Process robot task and return the action sequences"""
-    global engine
+def select_fields(result: Dict, fields: Optional[List[str]], include_raw: bool) -> Dict:
+    """Keep only the requested response fields"""
+    names = RESPONSE_FIELDS if not fields else [name for name in RESPONSE_FIELDS if name in fields]
+    return {name: result.get(name) for name in names if include_raw or name != "raw_output"}
+
+def encoded_response(payload: Any, media: str, status_code: int = 200, trace: Optional[RequestTrace] = None) -> Response:
+    content = wire.encode(payload, media)
+    if trace is None:
+        return Response(content=content, status_code=status_code, media_type=media)
+    trace.mark("encode")
+    trace.info["status"] = status_code
+    trace.info["response_bytes"] = len(content)
+    trace.info["loop_lag_ms"] = loop_lag["last"] * 1000
+    slow_log.record(trace)
+    if trace.payload is not None and recorder is not None:
+        recorder.offer({"request": trace.payload, "media": media, **trace.to_dict()})
+    return Response(content=content, status_code=status_code, media_type=media,
+                    headers={"X-Request-ID": trace.trace_id})
+
+@app.post(
+    "/robot/task",
+    openapi_extra={"requestBody": {"required": True, "content": {
+        wire.JSON: {"schema": RobotTaskRequest.model_json_schema()},
+        wire.MSGPACK: {"schema": RobotTaskRequest.model_json_schema()},
+    }}},
+    responses={200: {"model": RobotTaskResponse, "content": {wire.MSGPACK: {}}}},
+)
+async def robot_task(request: Request, background_tasks: BackgroundTasks):
+    """
+    Process robot task and return the action sequences
+
+    The body may be JSON or msgpack (Content-Type: application/msgpack); the
+    response uses the encoding named in Accept, or the request's encoding.
+    ?include_raw=false and ?fields=actions,... trim the response.
+    """
+    trace = RequestTrace(request.headers.get("x-request-id") or uuid.uuid4().hex)
+    content_type = request.headers.get("content-type")
+    media = wire.negotiate(request.headers.get("accept"), content_type)
+    if not is_ready():
+        return encoded_response({"error": "Server is still initializing"}, media, 503, trace)
     
-    if engine is None:
-        return JSONResponse(
-            status_code=503,
-            content={"error": "Server is still initializing"}
-        )
+    try:
+        payload = wire.decode(await request.body(), content_type)
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be an object")
+        if "include_raw" in request.query_params:
+            payload["include_raw"] = request.query_params["include_raw"].lower() not in ("0", "false", "no")
+        if "fields" in request.query_params:
+            payload["fields"] = request.query_params["fields"].split(",")
+        if recorder is not None and recorder.sampled():
+            trace.payload = payload
+        task = RobotTaskRequest.model_validate(payload)
+    except ValidationError as e:
+        # The raw input is left out: a msgpack body can hold values JSON cannot encode (bytes, non-string keys)
+        detail = e.errors(include_url=False, include_context=False, include_input=False)
+        return encoded_response({"detail": detail}, media, 422, trace)
+    except ValueError as e:
+        return encoded_response({"detail": str(e)}, media, 400, trace)
+    trace.info["n"] = task.n
+    trace.mark("decode")
     
     try:
         # Process the task with proper concurrency handling
-        result = await process_robot_task(request)
+        result = await process_robot_task(task, trace)
         
         if "error" in result:
-            return JSONResponse(
-                status_code=500,
-                content={"error": result["error"]}
-            )
+            return encoded_response({"error": result["error"]}, media, 500, trace)
         
-        return RobotTaskResponse(
-            actions=result["actions"],
-            raw_output=result["raw_output"]
-        )
+        return encoded_response(select_fields(result, task.fields, task.include_raw), media, 200, trace)
     
     except Exception as e:
-        logger.error(f"Unhandled exception in robot_task: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Internal Server Error: {str(e)}"}
+        logger.error(f"[{trace.trace_id}] Unhandled exception in robot_task: {str(e)}")
+        return encoded_response({"error": f"Internal Server Error: {str(e)}"}, media, 500, trace)
+
+def check_admin(request: Request) -> Optional[JSONResponse]:
+    """Return an error response unless the request carries the admin token"""
+    if admin_token is None:
+        return JSONResponse(status_code=403, content={"error": "Admin endpoints are disabled; start with --admin-token"})
+    # Constant-time comparison so the token cannot be guessed from response times; bytes,
+    # since compare_digest rejects non-ASCII strings
+    provided = request.headers.get("authorization", "").encode()
+    if not secrets.compare_digest(provided, f"Bearer {admin_token}".encode()):
+        return JSONResponse(status_code=401, content={"error": "Invalid admin token"})
+    return None
+
+@app.get("/admin/slow_requests")
+async def admin_slow_requests(request: Request):
+    """The slowest requests seen so far, with per-stage timings and prompt sizes"""
+    error = check_admin(request)
+    if error is not None:
+        return error
+    return {"max_loop_lag_ms": loop_lag["max"] * 1000, "slowest": slow_log.snapshot()}
+
+@app.delete("/admin/slow_requests")
+async def admin_clear_slow_requests(request: Request):
+    """Forget the recorded slow requests and the maximum loop lag"""
+    error = check_admin(request)
+    if error is not None:
+        return error
+    slow_log.clear()
+    loop_lag["max"] = 0.0
+    return {"status": "cleared"}
+
+@app.get("/admin/traffic")
+async def admin_traffic(request: Request):
+    """Counters of the traffic recorder"""
+    error = check_admin(request)
+    if error is not None:
+        return error
+    if recorder is None:
+        return {"enabled": False}
+    return {"enabled": True, "directory": recorder.directory, "sample_rate": recorder.sample_rate,
+            "queued": recorder.queue.qsize(), **recorder.stats}
+
+@app.post("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10.0, interval_ms: float = 5.0):
+    """
+    Sample the stacks of every thread of the server for a bounded window
+
+    Returns folded stacks (one "frame;frame;... count" line per stack) that
+    flamegraph.pl or speedscope can render.
+    """
+    error = check_admin(request)
+    if error is not None:
+        return error
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        return JSONResponse(status_code=400, content={"error": f"seconds must be in (0, {MAX_PROFILE_SECONDS:.0f}] and interval_ms >= 1"})
+    if profile_lock.locked():
+        return JSONResponse(status_code=409, content={"error": "A profile is already running"})
+    async with profile_lock:
+        logger.info(f"Profiling for {seconds:.1f}s")
+        loop = asyncio.get_running_loop()
+        counts = await loop.run_in_executor(None, partial(sample_stacks, seconds, interval_ms / 1000))
+    return PlainTextResponse(format_folded(counts))
+
+@contextmanager
+def startup_phase(name: str):
+    """Mark a startup phase as current and record how long it took."""
+    startup_state["phase"] = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_state["timings"][name] = time.perf_counter() - start
+
+def import_vllm_engine_factory():
+    """Import vLLM lazily and return an engine factory: (model_path, **kwargs) -> (engine, SamplingParams)"""
+    from vllm.engine.arg_utils import AsyncEngineArgs
+    from vllm.engine.async_llm_engine import AsyncLLMEngine
+    from vllm.sampling_params import SamplingParams as VllmSamplingParams
+
+    def create_vllm_engine(model_path: str, **kwargs):
+        engine_args = AsyncEngineArgs(
+            model=model_path,
+            dtype="bfloat16",
+            **kwargs
         )
+        return AsyncLLMEngine.from_engine_args(engine_args), VllmSamplingParams
+
+    return create_vllm_engine
 
-async def initialize(model_path: str = "jan-hq/AlphaTable-1.5B", max_concurrent_requests: int = 5, **kwargs):
-    """Initialize the LLM engine with the given model path"""
-    global engine, request_semaphore
+def load_warmup_tasks(warmup_file: Optional[str] = None) -> List[Dict]:
+    """Load warmup tasks ([{"instruction": ..., "objects": [...]}, ...]) from a JSON file, or use the built-in ones"""
+    if warmup_file is None:
+        return WARMUP_TASKS
+    with open(warmup_file) as f:
+        return json.load(f)
+
+async def warmup(num_requests: int, tasks: List[Dict]):
+    """Run representative generations through the full request path before reporting ready"""
+    if num_requests <= 0 or not tasks:
+        return
+    requests = [RobotTaskRequest(**tasks[i % len(tasks)]) for i in range(num_requests)]
+    results = await asyncio.gather(*(process_robot_task(request) for request in requests))
+    for result in results:
+        if "error" in result:
+            raise RuntimeError(f"Warmup generation failed: {result['error']}")
+
+async def initialize(model_path: str = "jan-hq/AlphaTable-1.5B", max_concurrent_requests: int = 5,
+                     spec: GridSpec = DEFAULT_GRID, warmup_requests: int = 2, warmup_file: Optional[str] = None,
+                     engine_factory=None, **kwargs):
+    """
+    Initialize the LLM engine with the given model path and warm it up
+
+    Args:
+        model_path: Model path or name
+        max_concurrent_requests: Maximum number of concurrent requests to process
+        spec: Workspace grid spec the model was trained on
+        warmup_requests: Number of warmup generations to run before reporting ready
+        warmup_file: JSON file with warmup tasks; the built-in WARMUP_TASKS by default
+        engine_factory: Callable (model_path, **kwargs) -> (engine, SamplingParams class); vLLM by default
+        **kwargs: Extra engine arguments
+    """
+    global engine, SamplingParams, request_semaphore, grid_spec
     
     try:
         logger.info(f"Initializing LLM engine with model {model_path}")
+        grid_spec = spec.validate()
         
         # Create a semaphore to limit concurrent requests
         request_semaphore = asyncio.Semaphore(max_concurrent_requests)
         
-        engine_args = AsyncEngineArgs(
-            model=model_path,
-            dtype="bfloat16",
-            **kwargs
-        )
+        with startup_phase("import"):
+            if engine_factory is None:
+                engine_factory = import_vllm_engine_factory()
+        
+        # Build the engine off the event loop so health checks keep answering
+        with startup_phase("engine_init"):
+            loop = asyncio.get_running_loop()
+            engine, SamplingParams = await loop.run_in_executor(None, partial(engine_factory, model_path, **kwargs))
         
-        # Initialize the engine
-        engine = AsyncLLMEngine.from_engine_args(engine_args)
-        logger.info("LLM engine initialization complete")
+        with startup_phase("warmup"):
+            await warmup(warmup_requests, load_warmup_tasks(warmup_file))
+        
+        startup_state["timings"]["total"] = time.perf_counter() - _process_start
+        startup_state["phase"] = "ready"
+        timings = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in startup_state["timings"].items())
+        logger.info(f"LLM engine ready ({timings})")
         return app
     except Exception as e:
+        startup_state["phase"] = "failed"
+        startup_state["error"] = str(e)
         logger.error(f"Failed to initialize engine: {str(e)}")
         raise
 
+async def run_startup():
+    """Run initialize() with server_config; failures are reported through /health/ready"""
+    try:
+        await initialize(**server_config)
+    except Exception:
+        pass
+
 def start_server(host="0.0.0.0", port=8000, model_path="jan-hq/AlphaTable-1.5B", 
-                max_concurrent_requests=5, **kwargs):
-    """Start the server with the given host and port"""
+                max_concurrent_requests=5, spec=DEFAULT_GRID, warmup_requests=2, warmup_file=None,
+                engine_factory=None, slow_log_size=50, admin_token_value=None, record_dir=None,
+                record_sample_rate=1.0, record_queue_size=1000, record_max_records=10000, record_max_seconds=600.0,
+                **kwargs):
+    """Start the server with the given host and port; the engine loads in the background"""
     import uvicorn
+    global slow_log, admin_token, recorder_config
     
-    # Create a new event loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    slow_log = SlowRequestLog(slow_log_size)
+    admin_token = admin_token_value
+    if record_dir is not None:
+        recorder_config = {
+            "directory": record_dir,
+            "sample_rate": record_sample_rate,
+            "queue_size": record_queue_size,
+            "max_records": record_max_records,
+            "max_seconds": record_max_seconds,
+        }
+    server_config.update(
+        model_path=model_path,
+        max_concurrent_requests=max_concurrent_requests,
+        spec=spec,
+        warmup_requests=warmup_requests,
+        warmup_file=warmup_file,
+        engine_factory=engine_factory,
+        **kwargs
+    )
     
-    # Initialize the engine
     try:
-        loop.run_until_complete(initialize(
-            model_path=model_path, 
-            max_concurrent_requests=max_concurrent_requests, 
-            **kwargs
-        ))
-        
         # Start the server
         logger.info(f"Starting server on {host}:{port}")
         uvicorn.run(app, host=host, port=port)
@@ -301,9 +598,29 @@ if __name__ == "__main__":
     parser.add_argument("--max-model-len", type=int, default=4096, help="Maximum model length")
     parser.add_argument("--max-concurrent-requests", type=int, default=10, 
                       help="Maximum number of concurrent requests to process")
+    parser.add_argument("--workspace", type=int, default=100, help="Workspace resolution the model was trained on")
+    parser.add_argument("--grid-size", type=int, default=25, help="Global grid resolution the model was trained on")
+    parser.add_argument("--warmup-requests", type=int, default=2, help="Warmup generations to run before reporting ready")
+    parser.add_argument("--warmup-file", type=str, default=None, help="JSON file with warmup tasks")
+    parser.add_argument("--slow-log-size", type=int, default=50, help="Number of slowest requests to keep (0 disables)")
+    parser.add_argument("--admin-token", type=str, default=None, help="Bearer token enabling the /admin endpoints")
+    parser.add_argument("--record-dir", type=str, default=None, help="Capture sampled requests to gzip JSONL files in this directory")
+    parser.add_argument("--record-sample-rate", type=float, default=1.0, help="Fraction of requests to capture")
+    parser.add_argument("--record-queue-size", type=int, default=1000, help="Captured requests buffered before dropping")
+    parser.add_argument("--record-max-records", type=int, default=10000, help="Captured requests per file before rotating")
+    parser.add_argument("--record-max-seconds", type=float, default=600.0, help="Seconds a capture file stays open before rotating")
+    parser.add_argument("--stub-engine", action="store_true", help="Serve with a CPU-only stub engine instead of vLLM")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds per generation for the stub engine")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0,
+                      help="Probability that a stub completion is off by one local cell")
     
     args = parser.parse_args()
     
+    engine_factory = None
+    if args.stub_engine:
+        from stub_engine import create_stub_engine
+        engine_factory = partial(create_stub_engine, latency=args.stub_latency, error_rate=args.stub_error_rate)
+    
     try:
         start_server(
             host=args.host,
@@ -311,7 +628,18 @@ if __name__ == "__main__":
             model_path=args.model,
             gpu_memory_utilization=args.gpu_memory_utilization,
             max_model_len=args.max_model_len,
-            max_concurrent_requests=args.max_concurrent_requests
+            max_concurrent_requests=args.max_concurrent_requests,
+            spec=GridSpec(args.workspace, args.grid_size),
+            warmup_requests=args.warmup_requests,
+            warmup_file=args.warmup_file,
+            engine_factory=engine_factory,
+            slow_log_size=args.slow_log_size,
+            admin_token_value=args.admin_token,
+            record_dir=args.record_dir,
+            record_sample_rate=args.record_sample_rate,
+            record_queue_size=args.record_queue_size,
+            record_max_records=args.record_max_records,
+            record_max_seconds=args.record_max_seconds
         )
     except Exception as e:
         logger.critical(f"Fatal error: {str(e)}")
\ No newline at end of file
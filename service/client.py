@@ -1,6 +1,6 @@
 import requests
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class RobotTaskClient:
     """Client for interacting with the Robot Reasoning API."""
@@ -21,24 +21,42 @@ class RobotTaskClient:
         response.raise_for_status()  # Raise an exception for bad status codes
         return response.json()
 
-    def send_task(self, instruction: str, objects: List[Dict[str, List[int]]]) -> Dict:
+    def send_task(self, instruction: str, objects: List[Dict[str, List[int]]], n: int = 1,
+                  early_stop_k: Optional[int] = None, include_raw: bool = True, encoding: str = "json") -> Dict:
         """
         Send a robot task to the API and get the response.
 
         Args:
             instruction: The task instruction.
             objects: A list of dictionaries, each representing an object with its name and [x, y, z] coordinates.
+            n: Number of completions to sample in one engine call and vote on.
+            early_stop_k: Stop sampling once this many completions agree.
+            include_raw: Set to False to skip returning the reasoning text in 'raw_output'.
+            encoding: "json" or "msgpack" (requires the msgpack package) for the request and response bodies.
 
         Returns:
-            A dictionary containing the 'actions' (list of action arrays) and 'raw_output' (the raw model output).
+            A dictionary containing the 'actions' (list of action arrays) and 'raw_output' (the raw model output),
+            plus 'consensus' agreement stats when n > 1.
             Raises an exception if the request fails.
         """
         url = f"{self.base_url}/robot/task"
-        headers = {"Content-Type": "application/json"}
         data = {
             "instruction": instruction,
             "objects": objects,
         }
+        if n > 1:
+            data["n"] = n
+            if early_stop_k is not None:
+                data["early_stop_k"] = early_stop_k
+        if not include_raw:
+            data["include_raw"] = False
+        if encoding == "msgpack":
+            import msgpack
+            headers = {"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+            response = requests.post(url, headers=headers, data=msgpack.packb(data))
+            response.raise_for_status()
+            return msgpack.unpackb(response.content)
+        headers = {"Content-Type": "application/json"}
         response = requests.post(url, headers=headers, data=json.dumps(data))
         response.raise_for_status()
         return response.json()
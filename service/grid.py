@@ -0,0 +1,148 @@
+import re
+from array import array
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+EMPTY_TOKEN = "<|empty|>"
+
+STEP_PATTERN = re.compile(r'Step \d+: \["<\|(\d+)-(\d+)\|>", "<\|local-(\d+)-(\d+)\|>", (\d+), (\d+), (\d+), (\d+), (\d+)\]')
+
+
+class GridSpec(NamedTuple):
+    """
+    Resolution hierarchy of the workspace.
+
+    The workspace is a workspace x workspace discrete grid, divided into a
+    grid_size x grid_size grid of global cells, each holding a
+    local_size x local_size local grid.
+    """
+
+    workspace: int = 100
+    grid_size: int = 25
+
+    @property
+    def local_size(self) -> int:
+        return self.workspace // self.grid_size
+
+    def validate(self) -> "GridSpec":
+        if self.grid_size <= 0 or self.workspace <= 0 or self.workspace % self.grid_size:
+            raise ValueError(f"workspace ({self.workspace}) must be a positive multiple of grid_size ({self.grid_size})")
+        return self
+
+    def discretize(self, x: int, y: int) -> Tuple[int, int, int, int]:
+        """Map workspace coordinates to (global_row, global_col, local_row, local_col)."""
+        local_size = self.workspace // self.grid_size
+        # Clamped on both sides so that a cell index is always inside the desk
+        return (
+            max(0, min(self.grid_size - 1, x // local_size)),
+            max(0, min(self.grid_size - 1, y // local_size)),
+            x % local_size,
+            y % local_size,
+        )
+
+    def undiscretize(self, row: int, col: int, local_row: int, local_col: int) -> Tuple[int, int]:
+        local_size = self.workspace // self.grid_size
+        return row * local_size + local_row, col * local_size + local_col
+
+    def position_tokens(self, x: int, y: int) -> Tuple[str, str]:
+        row, col, local_row, local_col = self.discretize(x, y)
+        return f"<|{row}-{col}|>", f"<|local-{local_row}-{local_col}|>"
+
+    def fill(self, template: str) -> str:
+        """Substitute the {workspace}, {grid_size}, {local_size} and {local_max} fields of a prompt template."""
+        return _fill_template(template, self)
+
+
+DEFAULT_GRID = GridSpec(100, 25)
+
+
+@lru_cache(maxsize=64)
+def _fill_template(template: str, spec: GridSpec) -> str:
+    # str.replace rather than str.format so the other {fields} stay in place
+    return (
+        template.replace("{workspace}", str(spec.workspace))
+        .replace("{grid_size}", str(spec.grid_size))
+        .replace("{local_size}", str(spec.local_size))
+        .replace("{local_max}", str(spec.local_size - 1))
+    )
+
+
+@lru_cache(maxsize=8)
+def desk_skeleton(spec: GridSpec):
+    """
+    Build the empty desk for a grid spec once and cache it.
+
+    Returns:
+        A tuple of the empty desk string and an array with, for every cell
+        (row * grid_size + col), the offset of its <|empty|> token
+    """
+    spec.validate()
+    parts = ["<desk>\n"]
+    offset = len(parts[0])
+    empty_offsets = array("l")
+    for row in range(spec.grid_size):
+        for col in range(spec.grid_size):
+            position = f"<|{row}-{col}|>"
+            offset += len(position)
+            empty_offsets.append(offset)
+            parts.append(position)
+            parts.append(EMPTY_TOKEN)
+            offset += len(EMPTY_TOKEN)
+        parts.append("\n")
+        offset += 1
+    parts.append("</desk>")
+    return "".join(parts), empty_offsets
+
+
+def render_cells(cells, spec: GridSpec = DEFAULT_GRID) -> str:
+    """
+    Render a desk from its occupied cells by splicing them into the cached skeleton.
+
+    The work done in Python scales with the number of occupied cells; the rest
+    is a copy of the cached empty desk.
+
+    Args:
+        cells: Dictionary mapping cell index (row * grid_size + col) to the
+               string replacing <|empty|> in that cell
+        spec: The grid spec
+
+    Returns:
+        The tokenized desk string
+    """
+    skeleton, empty_offsets = desk_skeleton(spec)
+    if not cells:
+        return skeleton
+    pieces = []
+    previous = 0
+    for index in sorted(cells):
+        start = empty_offsets[index]
+        pieces.append(skeleton[previous:start])
+        pieces.append(cells[index])
+        previous = start + len(EMPTY_TOKEN)
+    pieces.append(skeleton[previous:])
+    return "".join(pieces)
+
+
+def parse_and_convert(output_text: str, spec: GridSpec = DEFAULT_GRID) -> List[List[int]]:
+    """
+    Parse the model output and convert to workspace space, returning a list of action arrays
+
+    Args:
+        output_text: The full output text from the model
+        spec: The grid spec the model was prompted with
+
+    Returns:
+        List of action arrays in workspace space format [x, y, z, roll, pitch, yaw, gripper]
+    """
+    local_size = spec.local_size
+    action_sequences = []
+    for match in STEP_PATTERN.findall(output_text):
+        row, col, local_row, local_col, z, roll, pitch, yaw, gripper = map(int, match)
+
+        # Convert from the global/local grid to workspace space
+        x = row * local_size + local_row
+        y = col * local_size + local_col
+
+        action_sequences.append([x, y, z, roll, pitch, yaw, gripper])
+
+    return action_sequences
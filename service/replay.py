@@ -0,0 +1,110 @@
+"""
+Replay captured traffic (api.py --record-dir) against any Robot Reasoning API server.
+
+Requests are re-issued open-loop at their original spacing, scaled by
+--speed, so a slow server sees the same arrival pattern as production
+instead of fewer requests. --speed 0 sends them back to back with at most
+--concurrency in flight.
+
+    python replay.py captures/ --url http://localhost:8000 --speed 2
+"""
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+import httpx
+
+import wire
+from traffic import iter_records
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def send(client: httpx.AsyncClient, record: Dict) -> Dict:
+    media = record.get("media", wire.JSON)
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/robot/task",
+            content=wire.encode(record["request"], media),
+            headers={"content-type": media, "accept": media, "x-request-id": f"replay-{record['trace_id']}"},
+        )
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    return {"status": status, "latency": time.perf_counter() - start, "recorded_ms": record.get("total_ms")}
+
+
+async def replay(records: List[Dict], url: str, speed: float = 1.0, concurrency: int = 64,
+                 timeout: float = 600.0) -> List[Dict]:
+    """
+    Re-issue captured requests against a server.
+
+    Args:
+        records: Captured records, in any order
+        url: Base URL of the server
+        speed: Rate multiplier relative to the capture; 0 sends as fast as possible
+        concurrency: Requests in flight when speed is 0
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        One result per request with its status, latency and recorded latency
+    """
+    records = sorted(records, key=lambda record: record["started_at"])
+    limits = httpx.Limits(max_connections=None if speed > 0 else concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        if speed <= 0:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def bounded(record):
+                async with semaphore:
+                    return await send(client, record)
+            return await asyncio.gather(*(bounded(record) for record in records))
+
+        first = records[0]["started_at"]
+        start = time.perf_counter()
+        tasks = []
+        for record in records:
+            delay = (record["started_at"] - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, record)))
+        return await asyncio.gather(*tasks)
+
+
+def summarize(results: List[Dict], wall: float):
+    latencies = sorted(result["latency"] * 1000 for result in results)
+    recorded = sorted(result["recorded_ms"] for result in results if result["recorded_ms"] is not None)
+    errors = sum(1 for result in results if result["status"] != 200)
+    print(f"Replayed {len(results)} requests in {wall:.1f}s ({len(results) / wall:.1f} req/s), {errors} errors")
+    print(f"{'':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, values in (("replay", latencies), ("recorded", recorded)):
+        if values:
+            print(f"{label:>10} {percentile(values, 0.5):>8.1f} {percentile(values, 0.95):>8.1f} {percentile(values, 0.99):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Robot Reasoning API traffic.")
+    parser.add_argument("captures", nargs="+", help="Capture files or directories")
+    parser.add_argument("--url", type=str, default="http://localhost:8000", help="Base URL of the server to replay against")
+    parser.add_argument("--speed", type=float, default=1.0, help="Rate multiplier relative to the capture (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight when --speed is 0")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many requests")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    records = list(iter_records(args.captures, args.limit))
+    if not records:
+        parser.error("No captured requests found")
+    start = time.perf_counter()
+    results = asyncio.run(replay(records, args.url, args.speed, args.concurrency, args.timeout))
+    summarize(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Load-aware front router for several Robot Reasoning API replicas.
+
+Tracks outstanding requests and readiness of every replica, dispatches each
+request to the replica with the fewest outstanding requests (or, with
+--policy affinity, to the replica that served the same scene before so its
+prefix cache is reused), ejects replicas that fail and streams responses back.
+
+Try it on a CPU-only box against local stub replicas:
+
+    python router.py --spawn-stub-replicas 3 --stub-latency 0.5
+
+When started by uvicorn directly, the backends come from the environment:
+
+    ROUTER_BACKENDS=http://10.0.0.1:8000,http://10.0.0.2:8000 uvicorn router:app --port 8080
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import subprocess
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+import wire
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("robot-reasoning-router")
+
+# Headers that apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+
+class Backend:
+    """One API replica and the router's view of its load and health."""
+
+    __slots__ = ("url", "outstanding", "healthy", "failures", "ejected_until", "total_requests")
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = False
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def status(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+            "total_requests": self.total_requests,
+        }
+
+
+class BackendPool:
+    """
+    Chooses a backend per request and tracks failures.
+
+    Args:
+        urls: Base URLs of the replicas
+        policy: "least_outstanding" or "affinity"
+        eject_after: Consecutive failures after which a backend is ejected
+        eject_seconds: How long an ejected backend receives no traffic
+        affinity_slack: With the affinity policy, fall back to the least loaded
+                        backend when the preferred one has this many more
+                        outstanding requests
+    """
+
+    def __init__(self, urls: List[str], policy: str = "least_outstanding", eject_after: int = 3,
+                 eject_seconds: float = 10.0, affinity_slack: int = 2):
+        if policy not in ("least_outstanding", "affinity"):
+            raise ValueError(f"Unknown routing policy: {policy}")
+        self.backends = [Backend(url) for url in urls]
+        self.policy = policy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.affinity_slack = affinity_slack
+
+    def available(self, exclude=()) -> List[Backend]:
+        now = time.monotonic()
+        return [backend for backend in self.backends if backend.available(now) and backend not in exclude]
+
+    def choose(self, affinity_key: Optional[bytes] = None, exclude=()) -> Optional[Backend]:
+        candidates = self.available(exclude)
+        if not candidates:
+            return None
+        fewest = min(backend.outstanding for backend in candidates)
+        if self.policy == "affinity" and affinity_key is not None:
+            # Rendezvous hashing keeps a scene on the same replica while the set of healthy replicas is stable
+            preferred = max(candidates, key=lambda backend: hashlib.blake2b(affinity_key + backend.url.encode(), digest_size=8).digest())
+            if preferred.outstanding <= fewest + self.affinity_slack:
+                return preferred
+        return random.choice([backend for backend in candidates if backend.outstanding == fewest])
+
+    def record_success(self, backend: Backend):
+        backend.failures = 0
+
+    def record_failure(self, backend: Backend):
+        backend.failures += 1
+        if backend.failures >= self.eject_after:
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+            logger.warning(f"Ejecting {backend.url} for {self.eject_seconds:.0f}s after {backend.failures} failures")
+
+
+def scene_affinity_key(body: bytes, content_type: Optional[str] = None) -> Optional[bytes]:
+    """Hash the scene of a /robot/task body; requests on the same scene share a prompt prefix."""
+    try:
+        objects = wire.decode(body, content_type)["objects"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return hashlib.blake2b(json.dumps(objects, separators=(",", ":")).encode(), digest_size=16).digest()
+
+
+# Global variables
+pool = None
+http_client = None
+health_task = None
+# Router configuration; start_router() fills it in, `uvicorn router:app` reads the
+# ROUTER_* environment variables. transport replaces the network (e.g. httpx.MockTransport)
+router_config = {
+    "backends": [url for url in os.environ.get("ROUTER_BACKENDS", "").split(",") if url],
+    "policy": os.environ.get("ROUTER_POLICY", "least_outstanding"),
+    "health_interval": float(os.environ.get("ROUTER_HEALTH_INTERVAL", 2.0)),
+    "eject_after": int(os.environ.get("ROUTER_EJECT_AFTER", 3)),
+    "eject_seconds": float(os.environ.get("ROUTER_EJECT_SECONDS", 10.0)),
+    "transport": None,
+}
+
+
+async def check_backend(backend: Backend):
+    try:
+        response = await http_client.get(f"{backend.url}/health/ready", timeout=router_config["health_interval"])
+        ready = response.status_code == 200
+    except httpx.HTTPError:
+        ready = False
+    if ready != backend.healthy:
+        logger.info(f"Backend {backend.url} is now {'ready' if ready else 'not ready'}")
+    # A replica that is not ready (e.g. still warming up) simply gets no traffic;
+    # ejection is reserved for replicas failing real requests
+    backend.healthy = ready
+
+
+async def health_loop():
+    while True:
+        await asyncio.gather(*(check_backend(backend) for backend in pool.backends))
+        await asyncio.sleep(router_config["health_interval"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pool, http_client, health_task
+    # Built here rather than in start_router() so that `uvicorn router:app` works too
+    pool = BackendPool(router_config["backends"], policy=router_config["policy"],
+                       eject_after=router_config["eject_after"], eject_seconds=router_config["eject_seconds"])
+    if not pool.backends:
+        logger.warning("No backends configured; pass --backends or set ROUTER_BACKENDS")
+    logger.info(f"Routing to {len(pool.backends)} backends with policy {pool.policy}")
+    # Generations can take a long time; only bound connecting
+    http_client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0), limits=httpx.Limits(max_connections=None),
+                                    transport=router_config["transport"])
+    health_task = asyncio.create_task(health_loop())
+    yield
+    health_task.cancel()
+    await http_client.aclose()
+
+app = FastAPI(title="Robot Reasoning Router", lifespan=lifespan)
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness check of the router itself."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Ready while at least one backend can take traffic."""
+    if not pool.available():
+        return JSONResponse(status_code=503, content={"status": "no backends available"})
+    return {"status": "ready"}
+
+
+@app.get("/router/status")
+async def router_status():
+    """Per-backend load and health."""
+    return {"policy": pool.policy, "backends": [backend.status() for backend in pool.backends]}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
+async def proxy(path: str, request: Request):
+    """Forward a request to the chosen backend and stream its response back"""
+    body = await request.body()
+    affinity_key = scene_affinity_key(body, request.headers.get("content-type")) if pool.policy == "affinity" and path == "robot/task" else None
+    headers = [(key, value) for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS]
+
+    tried = []
+    while True:
+        backend = pool.choose(affinity_key, exclude=tried)
+        if backend is None:
+            return JSONResponse(status_code=503, content={"error": "No healthy backend available"})
+        tried.append(backend)
+        backend.outstanding += 1
+        backend.total_requests += 1
+        upstream_request = http_client.build_request(
+            request.method,
+            f"{backend.url}/{path}",
+            params=request.query_params,
+            headers=headers,
+            content=body,
+        )
+        try:
+            upstream = await http_client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            # Nothing was sent to the client yet, so the request can go to another backend
+            backend.outstanding -= 1
+            pool.record_failure(backend)
+            logger.warning(f"Backend {backend.url} failed: {e!r}")
+            continue
+        break
+
+    if upstream.status_code >= 500:
+        pool.record_failure(backend)
+    else:
+        pool.record_success(backend)
+
+    released = False
+
+    async def release():
+        # Runs when the stream ends, or as a background task if it never started
+        nonlocal released
+        if not released:
+            released = True
+            backend.outstanding -= 1
+            await upstream.aclose()
+
+    async def stream():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await release()
+
+    response_headers = {key: value for key, value in upstream.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+    return StreamingResponse(
+        stream(),
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(release),
+    )
+
+
+def spawn_stub_replicas(count: int, base_port: int, latency: float) -> List[subprocess.Popen]:
+    """Start local api.py replicas backed by the stub engine"""
+    processes = []
+    for i in range(count):
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+            "--host", "127.0.0.1",
+            "--port", str(base_port + i),
+            "--stub-engine",
+            "--stub-latency", str(latency),
+        ]))
+    return processes
+
+
+def start_router(backends: List[str], host="0.0.0.0", port=8080, policy="least_outstanding",
+                 interval=2.0, eject_after=3, eject_seconds=10.0):
+    """Start the router in front of the given backends"""
+    import uvicorn
+
+    router_config.update(
+        backends=backends,
+        policy=policy,
+        health_interval=interval,
+        eject_after=eject_after,
+        eject_seconds=eject_seconds,
+    )
+    logger.info(f"Starting the router on {host}:{port}")
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Robot Reasoning API Router")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind the router to")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind the router to")
+    parser.add_argument("--backends", type=str, nargs="*", default=[], help="Base URLs of the API replicas")
+    parser.add_argument("--policy", type=str, default="least_outstanding", choices=["least_outstanding", "affinity"],
+                      help="Dispatch to the least loaded replica, or keep each scene on one replica")
+    parser.add_argument("--health-interval", type=float, default=2.0, help="Seconds between readiness checks")
+    parser.add_argument("--eject-after", type=int, default=3, help="Consecutive failures before ejecting a replica")
+    parser.add_argument("--eject-seconds", type=float, default=10.0, help="How long an ejected replica gets no traffic")
+    parser.add_argument("--spawn-stub-replicas", type=int, default=0, help="Start this many local stub-engine replicas")
+    parser.add_argument("--stub-base-port", type=int, default=9100, help="First port of the spawned stub replicas")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Seconds per generation for the stub replicas")
+
+    args = parser.parse_args()
+
+    replicas = spawn_stub_replicas(args.spawn_stub_replicas, args.stub_base_port, args.stub_latency)
+    backends = args.backends + [f"http://127.0.0.1:{args.stub_base_port + i}" for i in range(args.spawn_stub_replicas)]
+    if not backends:
+        parser.error("Give --backends or --spawn-stub-replicas")
+
+    try:
+        start_router(
+            backends,
+            host=args.host,
+            port=args.port,
+            policy=args.policy,
+            interval=args.health_interval,
+            eject_after=args.eject_after,
+            eject_seconds=args.eject_seconds,
+        )
+    finally:
+        for replica in replicas:
+            replica.terminate()
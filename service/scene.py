@@ -0,0 +1,309 @@
+import json
+import random
+from typing import Dict, List, Tuple
+
+try:
+    from .grid import DEFAULT_GRID, EMPTY_TOKEN, GridSpec, render_cells
+except ImportError:  # imported as a top-level module from inside service/
+    from grid import DEFAULT_GRID, EMPTY_TOKEN, GridSpec, render_cells
+
+# The prompt vocabulary: every <|color|> and <|object|> token names one of these
+OBJECTS = ["moon", "star", "cube", "cylinder", "triangular prism"]
+COLORS = ["red", "maroon", "lime", "green", "blue", "navy", "yellow", "cyan", "magenta", "silver", "gray", "olive", "purple", "teal", "azure", "violet", "rose", "black", "white"]
+CONTAINER = "container"
+
+# Interned color/object vocabularies shared by every scene in the process.
+# Names are stored once and objects only carry small integer ids. The tables
+# are fixed: names outside the vocabulary are rejected, so client input can
+# neither grow them nor produce tokens the model has never seen.
+_color_names: List[str] = list(COLORS)
+_color_ids: Dict[str, int] = {color: color_id for color_id, color in enumerate(_color_names)}
+_object_names: List[str] = OBJECTS + [CONTAINER]
+_object_ids: Dict[str, int] = {object_type: object_id for object_id, object_type in enumerate(_object_names)}
+_object_tokens: Dict[Tuple[int, int], str] = {}
+
+
+def intern_color(color: str) -> int:
+    """
+    Raises:
+        ValueError: If color is not in COLORS
+    """
+    color_id = _color_ids.get(color)
+    if color_id is None:
+        raise ValueError(f"Unknown color {color!r}, expected one of {', '.join(_color_names)}")
+    return color_id
+
+
+def intern_object(object_type: str) -> int:
+    """
+    Raises:
+        ValueError: If object_type is neither in OBJECTS nor a container
+    """
+    object_id = _object_ids.get(object_type)
+    if object_id is None:
+        raise ValueError(f"Unknown object {object_type!r}, expected one of {', '.join(_object_names)}")
+    return object_id
+
+
+def integral(value) -> int:
+    """
+    Convert a coordinate to int without truncating it.
+
+    Raises:
+        ValueError: If value is a float with a fractional part or a string that is not an integer literal
+        TypeError: If value is not a number or string
+    """
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not an integral number")
+    return int(value)
+
+
+def object_token(color_id: int, object_id: int) -> str:
+    """Return the cached <|color|><|object|> token string for an interned pair."""
+    key = (color_id, object_id)
+    token = _object_tokens.get(key)
+    if token is None:
+        token = _object_tokens[key] = f"<|{_color_names[color_id]}|><|{_object_names[object_id]}|>"
+    return token
+
+
+class SceneObject:
+    """A single object on the desk: interned color/object ids and [x, y, z] in workspace units."""
+
+    __slots__ = ("color_id", "object_id", "x", "y", "z")
+
+    def __init__(self, color_id: int, object_id: int, x: int, y: int, z: int):
+        self.color_id = color_id
+        self.object_id = object_id
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @property
+    def color(self) -> str:
+        return _color_names[self.color_id]
+
+    @property
+    def object_type(self) -> str:
+        return _object_names[self.object_id]
+
+    @property
+    def name(self) -> str:
+        return f"{self.color}-{self.object_type}"
+
+    @property
+    def token(self) -> str:
+        return object_token(self.color_id, self.object_id)
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return (self.color_id, self.object_id)
+
+    def position(self) -> List[int]:
+        return [self.x, self.y, self.z]
+
+    def __repr__(self):
+        return f"SceneObject({self.name!r}, {self.position()})"
+
+
+class Scene:
+    """
+    Compact desk scene shared by the data generator, the desk renderer and the API.
+
+    Converts cheaply to and from the JSON shape used on the wire and in the
+    datasets: a list of single-key dictionaries such as {"red-cube": [x, y, z]}.
+    """
+
+    __slots__ = ("objects",)
+
+    def __init__(self, objects: List[SceneObject] = None):
+        self.objects = objects if objects is not None else []
+
+    def add(self, color: str, object_type: str, x: int, y: int, z: int) -> SceneObject:
+        obj = SceneObject(intern_color(color), intern_object(object_type), x, y, z)
+        self.objects.append(obj)
+        return obj
+
+    def shuffle(self, rng=random):
+        rng.shuffle(self.objects)
+
+    def heights(self) -> Dict[str, int]:
+        return {obj.token: obj.z for obj in self.objects}
+
+    def heights_json(self) -> str:
+        return json.dumps(self.heights())
+
+    def check_bounds(self, workspace: int) -> "Scene":
+        """
+        Raises:
+            ValueError: If an object lies outside the workspace x workspace grid
+        """
+        for obj in self.objects:
+            if not (0 <= obj.x < workspace and 0 <= obj.y < workspace):
+                raise ValueError(f"Position of {obj.name!r} must be within [0, {workspace}) on x and y, got {obj.position()}")
+        return self
+
+    @classmethod
+    def from_json(cls, objects_des, workspace: int = None) -> "Scene":
+        """
+        Build a scene from a list of {"color-object": [x, y, z]} dictionaries.
+
+        Args:
+            objects_des: The list, or its JSON string
+            workspace: If given, reject objects outside the workspace x workspace grid
+
+        Raises:
+            ValueError: If the input does not have that shape or names an
+                        unknown color or object
+        """
+        if isinstance(objects_des, str):
+            objects_des = json.loads(objects_des)
+        if not isinstance(objects_des, list):
+            raise ValueError("objects must be a list of {name: [x, y, z]} dictionaries")
+        scene = cls()
+        for obj_dict in objects_des:
+            if not isinstance(obj_dict, dict):
+                raise ValueError(f"Invalid object entry: {obj_dict!r}")
+            for obj_name, coords in obj_dict.items():
+                color, sep, object_type = obj_name.partition("-")
+                if not sep:
+                    raise ValueError(f"Object name must look like 'color-object': {obj_name!r}")
+                if not isinstance(coords, (list, tuple)) or len(coords) != 3:
+                    raise ValueError(f"Coordinates of {obj_name!r} must be [x, y, z]")
+                try:
+                    x, y, z = (integral(c) for c in coords)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Coordinates of {obj_name!r} must be integers, got {coords}") from None
+                scene.add(color.strip(), object_type.strip(), x, y, z)
+        if workspace is not None:
+            scene.check_bounds(workspace)
+        return scene
+
+    def to_json(self) -> List[Dict[str, List[int]]]:
+        return [{obj.name: obj.position()} for obj in self.objects]
+
+    @classmethod
+    def coerce(cls, value) -> "Scene":
+        return value if isinstance(value, cls) else cls.from_json(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # Validate straight into a Scene instead of List[Dict[str, List[int]]]
+        from pydantic_core import core_schema
+
+        return core_schema.no_info_plain_validator_function(
+            cls.coerce,
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda scene: scene.to_json()),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": {"type": "array", "items": {"type": "integer"}, "minItems": 3, "maxItems": 3},
+            },
+        }
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __repr__(self):
+        return f"Scene({self.objects!r})"
+
+
+def render_desk(scene: Scene, spec: GridSpec = DEFAULT_GRID):
+    """
+    Convert a scene into a tokenized desk representation with global and local positions
+
+    Args:
+        scene: The Scene to render; coordinates are in workspace units
+        spec: The grid spec (default: 100x100 workspace, 25x25 grid)
+
+    Returns:
+        A tuple of the tokenized desk string and the JSON string of object heights
+    """
+    grid_size = spec.grid_size
+    cells = {}
+    for obj in scene.objects:
+        row, col, local_row, local_col = spec.discretize(obj.x, obj.y)
+        cells[row * grid_size + col] = f"<|local-{local_row}-{local_col}|>{obj.token}"
+    return render_cells(cells, spec), scene.heights_json()
+
+
+class DeskState:
+    """
+    Occupied desk cells of a scene, kept up to date as objects move.
+
+    Moving an object only touches its old and new cell, and rendering splices
+    the occupied cells into the cached empty desk, so re-rendering after every
+    step of an episode costs as much as the handful of objects on the desk.
+    Each cell shows the object on top; objects covered by a stacked object or
+    inside a container are not shown. Cells touched since the last render are
+    tracked so that follow-up turns can show only what changed.
+    """
+
+    __slots__ = ("scene", "spec", "cells", "visible", "changed")
+
+    def __init__(self, scene: Scene, spec: GridSpec = DEFAULT_GRID):
+        self.scene = scene
+        self.spec = spec
+        self.cells = {}
+        self.visible = {}
+        self.changed = set()
+        for obj in scene.objects:
+            self.show(obj)
+        self.changed.clear()
+
+    def cell_index(self, obj: SceneObject) -> int:
+        row, col, _, _ = self.spec.discretize(obj.x, obj.y)
+        return row * self.spec.grid_size + col
+
+    def show(self, obj: SceneObject):
+        """Make obj the visible object of the cell it is in."""
+        row, col, local_row, local_col = self.spec.discretize(obj.x, obj.y)
+        index = row * self.spec.grid_size + col
+        self.cells[index] = f"<|local-{local_row}-{local_col}|>{obj.token}"
+        self.visible[index] = obj
+        self.changed.add(index)
+
+    def hide(self, obj: SceneObject):
+        """Remove obj from its cell if it is the visible object there."""
+        index = self.cell_index(obj)
+        if self.visible.get(index) is obj:
+            del self.cells[index]
+            del self.visible[index]
+            self.changed.add(index)
+
+    def move(self, obj: SceneObject, x: int, y: int, z: int, visible: bool = True):
+        """Move obj to [x, y, z]; with visible=False it ends up hidden (e.g. inside a container)."""
+        self.hide(obj)
+        obj.x, obj.y, obj.z = x, y, z
+        if visible:
+            self.show(obj)
+
+    def render(self):
+        """Return the tokenized desk string and the JSON string of object heights."""
+        self.changed.clear()
+        return render_cells(self.cells, self.spec), self.scene.heights_json()
+
+    def render_changes(self):
+        """
+        Render only the cells changed since the last render.
+
+        Returns:
+            The <desk-update> string, one changed cell per line as its
+            <|row-col|> token followed by its new content or <|empty|>, and the
+            JSON string of object heights
+        """
+        grid_size = self.spec.grid_size
+        parts = ["<desk-update>\n"]
+        for index in sorted(self.changed):
+            parts.append(f"<|{index // grid_size}-{index % grid_size}|>{self.cells.get(index, EMPTY_TOKEN)}\n")
+        parts.append("</desk-update>")
+        self.changed.clear()
+        return "".join(parts), self.scene.heights_json()
@@ -0,0 +1,142 @@
+"""
+Stand-in for the vLLM AsyncLLMEngine that runs without a GPU.
+
+It answers every prompt with a well-formed pick-and-place plan between the
+first two objects on the desk, so the whole request path (prompt building,
+generation, parsing, encoding) can be exercised and benchmarked on a CPU-only
+box. Start the server with --stub-engine to use it.
+"""
+import re
+import asyncio
+import random
+from typing import List
+
+CELL_PATTERN = re.compile(r'<\|(\d+)-(\d+)\|><\|local-(\d+)-(\d+)\|>')
+
+
+class StubSamplingParams:
+    """Accepts the vLLM SamplingParams arguments the server uses."""
+
+    def __init__(self, n: int = 1, temperature: float = 1.0, max_tokens: int = 16, seed=None, **kwargs):
+        self.n = n
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.seed = seed
+
+
+class StubCompletionOutput:
+    __slots__ = ("index", "text", "token_ids", "finish_reason")
+
+    def __init__(self, index: int, text: str, token_ids: List[int], finish_reason=None):
+        self.index = index
+        self.text = text
+        self.token_ids = token_ids
+        self.finish_reason = finish_reason
+
+    def finished(self) -> bool:
+        return self.finish_reason is not None
+
+
+class StubRequestOutput:
+    __slots__ = ("request_id", "prompt", "outputs", "finished")
+
+    def __init__(self, request_id: str, prompt: str, outputs: List[StubCompletionOutput], finished: bool):
+        self.request_id = request_id
+        self.prompt = prompt
+        self.outputs = outputs
+        self.finished = finished
+
+
+def stub_answer(prompt: str, off_by_one: bool = False) -> str:
+    """
+    Build a plan that moves the first object on the desk onto the second one.
+
+    With off_by_one the placement lands one local cell away, mimicking the
+    sampling errors best-of-N voting is meant to filter out.
+    """
+    cells = CELL_PATTERN.findall(prompt)
+    source = cells[0] if cells else ("0", "0", "0", "0")
+    target = cells[1] if len(cells) > 1 else source
+    if off_by_one:
+        row, col, local_row, local_col = target
+        target = (row, col, local_row, "1" if local_col == "0" else str(int(local_col) - 1))
+    steps = [
+        (source, 25, 1),
+        (source, 0, 1),
+        (source, 0, 0),
+        (source, 25, 0),
+        (target, 25, 0),
+        (target, 18, 0),
+        (target, 18, 1),
+    ]
+    lines = []
+    for i, ((row, col, local_row, local_col), z, gripper) in enumerate(steps):
+        lines.append(f'Step {i + 1}: ["<|{row}-{col}|>", "<|local-{local_row}-{local_col}|>", {z}, 0, 60, 90, {gripper}]')
+    think = (
+        "LOCATE OBJECTS:\n"
+        f"Target Object found at <|{source[0]}-{source[1]}|><|local-{source[2]}-{source[3]}|>\n"
+        f"Target Placement Location at <|{target[0]}-{target[1]}|><|local-{target[2]}-{target[3]}|>\n"
+    )
+    return f"<think>\n{think}\n</think>\n\n" + "\n".join(lines)
+
+
+class StubEngine:
+    """
+    Minimal async engine with the generate/abort interface of AsyncLLMEngine.
+
+    Like vLLM, a request with sampling_params.n > 1 yields cumulative outputs
+    for all n completions as each one finishes, and a request id that is
+    already in flight is rejected.
+
+    Args:
+        latency: Seconds each generation takes
+        error_rate: Probability that a completion is off by one local cell
+        seed: Seed for the completion timing and errors
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.aborted = set()
+        self.in_flight = set()
+        self.num_requests = 0
+
+    async def generate(self, prompt: str, sampling_params, request_id: str):
+        if request_id in self.in_flight:
+            raise KeyError(f"Request {request_id} already exists.")
+        self.in_flight.add(request_id)
+        try:
+            async for output in self._generate(prompt, sampling_params, request_id):
+                yield output
+        finally:
+            self.in_flight.discard(request_id)
+
+    async def _generate(self, prompt: str, sampling_params, request_id: str):
+        self.num_requests += 1
+        n = getattr(sampling_params, "n", 1)
+        # Completions of one request finish at slightly different times
+        finish_times = sorted(self.latency * (1 + 0.5 * self.rng.random()) for _ in range(n)) if n > 1 else [self.latency]
+        outputs = [StubCompletionOutput(i, "", []) for i in range(n)]
+        elapsed = 0.0
+        for i, finish_time in enumerate(finish_times):
+            if finish_time > elapsed:
+                await asyncio.sleep(finish_time - elapsed)
+                elapsed = finish_time
+            if request_id in self.aborted:
+                self.aborted.discard(request_id)
+                return
+            text = stub_answer(prompt, off_by_one=self.rng.random() < self.error_rate)
+            outputs[i].text = text
+            # Roughly four characters per token
+            outputs[i].token_ids = list(range(max(1, len(text) // 4)))
+            outputs[i].finish_reason = "stop"
+            yield StubRequestOutput(request_id, prompt, outputs, finished=i == n - 1)
+
+    async def abort(self, request_id: str):
+        self.aborted.add(request_id)
+
+
+def create_stub_engine(model_path: str = None, latency: float = 0.0, error_rate: float = 0.0, seed=None, **kwargs):
+    """Engine factory with the same contract as the vLLM one: returns (engine, sampling params class)."""
+    return StubEngine(latency=latency, error_rate=error_rate, seed=seed), StubSamplingParams
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The service modules import each other as top-level modules (python api.py), so
+# the tests import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,137 @@
+"""
+Startup, readiness and warmup of the API, served by the stub engine.
+
+    cd service && python -m pytest tests
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+from stub_engine import StubEngine, StubSamplingParams, create_stub_engine
+
+
+class FailingEngine(StubEngine):
+    async def _generate(self, prompt, sampling_params, request_id):
+        raise RuntimeError("CUDA out of memory")
+        yield
+
+
+@pytest.fixture
+def api(monkeypatch):
+    import api
+
+    # Every test starts from a fresh, not yet started server
+    monkeypatch.setattr(api, "engine", None)
+    monkeypatch.setattr(api, "startup_state", {"phase": "starting", "timings": {}, "error": None})
+    monkeypatch.setattr(api, "server_config", dict(api.server_config, warmup_requests=2, warmup_file=None))
+    return api
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not reached in time")
+        await asyncio.sleep(0.01)
+
+
+def test_ready_only_after_engine_init_and_warmup(api):
+    release = threading.Event()
+    engines = []
+
+    def slow_factory(model_path, **kwargs):
+        release.wait(5)
+        engine, sampling_params = create_stub_engine()
+        engines.append(engine)
+        return engine, sampling_params
+
+    api.server_config.update(engine_factory=slow_factory, warmup_requests=3)
+
+    async def scenario():
+        async with api.lifespan(api.app), client(api.app) as c:
+            await wait_until(lambda: api.startup_state["phase"] == "engine_init")
+            response = await c.get("/health/ready")
+            assert response.status_code == 503
+            assert response.json()["status"] == "engine_init"
+            assert (await c.get("/health/live")).status_code == 200
+            assert (await c.post("/robot/task", json=api.WARMUP_TASKS[0])).status_code == 503
+
+            release.set()
+            await wait_until(api.is_ready)
+            response = await c.get("/health/ready")
+            assert response.status_code == 200
+            assert {"engine_init", "warmup", "total"} <= set(response.json()["startup_seconds"])
+            assert (await c.post("/robot/task", json=api.WARMUP_TASKS[0])).status_code == 200
+
+    asyncio.run(scenario())
+    # Warmup went through the full request path once per warmup request
+    assert engines[0].num_requests == 4
+
+
+def test_warmup_failure_is_reported_not_ready(api):
+    api.server_config.update(engine_factory=lambda model_path, **kwargs: (FailingEngine(), StubSamplingParams))
+
+    async def scenario():
+        async with api.lifespan(api.app), client(api.app) as c:
+            await wait_until(lambda: api.startup_state["phase"] == "failed")
+            response = await c.get("/health/ready")
+            assert response.status_code == 503
+            assert "CUDA out of memory" in response.json()["error"]
+            assert (await c.get("/health")).json() == {"status": "failed"}
+
+    asyncio.run(scenario())
+
+
+def test_warmup_can_be_disabled(api):
+    engines = []
+
+    def factory(model_path, **kwargs):
+        engine, sampling_params = create_stub_engine()
+        engines.append(engine)
+        return engine, sampling_params
+
+    api.server_config.update(engine_factory=factory, warmup_requests=0)
+
+    async def scenario():
+        async with api.lifespan(api.app), client(api.app) as c:
+            await wait_until(api.is_ready)
+            assert (await c.get("/health/ready")).status_code == 200
+
+    asyncio.run(scenario())
+    assert engines[0].num_requests == 0
+
+
+def test_msgpack_body_gets_a_json_validation_error(api):
+    msgpack = pytest.importorskip("msgpack")
+    import wire
+
+    api.server_config.update(engine_factory=create_stub_engine, warmup_requests=0)
+    objects = [{"red-cube": [10, 10, 5]}]
+    # Values JSON cannot encode must not turn the 422 into a 500; a model-level error
+    # (early_stop_k > n) would echo the whole body
+    bodies = [
+        {"instruction": b"\x00binary", "objects": objects, "n": 1, "early_stop_k": 2},
+        {"instruction": "Stack the red cube", "objects": b"\x00binary"},
+        {"instruction": "Stack the red cube", "objects": objects, b"extra": "non-string key", "n": 1, "early_stop_k": 2},
+    ]
+
+    async def scenario():
+        async with api.lifespan(api.app), client(api.app) as c:
+            await wait_until(api.is_ready)
+            for body in bodies:
+                response = await c.post("/robot/task", content=msgpack.packb(body, use_bin_type=True),
+                                        headers={"content-type": wire.MSGPACK, "accept": wire.JSON})
+                assert response.status_code == 422
+                assert response.headers["content-type"].startswith(wire.JSON)
+                assert response.json()["detail"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,162 @@
+"""
+Readiness, ejection and affinity of the router, against backends faked with httpx.MockTransport.
+
+    cd service && python -m pytest tests
+"""
+import json
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+BACKENDS = ["http://replica-0:8000", "http://replica-1:8000", "http://replica-2:8000"]
+
+
+class FakeReplicas:
+    """Answers for every replica: readiness, /robot/task status, or a connection error."""
+
+    def __init__(self, urls):
+        self.ready = {httpx.URL(url).host: True for url in urls}
+        self.task_status = {host: 200 for host in self.ready}
+        self.unreachable = set()
+        self.served = Counter()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host in self.unreachable:
+            raise httpx.ConnectError("Connection refused", request=request)
+        if request.url.path == "/health/ready":
+            return httpx.Response(200 if self.ready[host] else 503, json={})
+        self.served[host] += 1
+        # An unread stream, like a real replica's, since the router streams the body through
+        return httpx.Response(self.task_status[host], headers={"content-type": "application/json"},
+                              stream=httpx.ByteStream(json.dumps({"replica": host}).encode()))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    import router
+
+    replicas = FakeReplicas(BACKENDS)
+    monkeypatch.setattr(router, "router_config", dict(
+        router.router_config,
+        backends=list(BACKENDS),
+        policy="least_outstanding",
+        health_interval=0.01,
+        eject_after=2,
+        eject_seconds=60.0,
+        transport=httpx.MockTransport(replicas.handler),
+    ))
+    monkeypatch.setattr(router, "replicas", replicas, raising=False)
+    return router
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not reached in time")
+        await asyncio.sleep(0.01)
+
+
+def task(scene):
+    return {"instruction": "Stack the red cube on top of the blue cube",
+            "objects": [{"red-cube": [scene, 10, 5]}, {"blue-cube": [50, 50, 5]}]}
+
+
+def test_pool_is_built_by_the_lifespan(router):
+    # `uvicorn router:app` never calls start_router()
+    async def scenario():
+        async with router.lifespan(router.app), client(router.app) as c:
+            status = (await c.get("/router/status")).json()
+            assert [backend["url"] for backend in status["backends"]] == BACKENDS
+
+    asyncio.run(scenario())
+
+
+def test_ready_follows_backend_readiness(router):
+    for host in router.replicas.ready:
+        router.replicas.ready[host] = False
+
+    async def scenario():
+        async with router.lifespan(router.app), client(router.app) as c:
+            await asyncio.sleep(0.05)
+            assert (await c.get("/health/ready")).status_code == 503
+            assert (await c.post("/robot/task", json=task(1))).status_code == 503
+
+            router.replicas.ready["replica-1"] = True
+            await wait_until(lambda: router.pool.available())
+            assert (await c.get("/health/ready")).status_code == 200
+            response = await c.post("/robot/task", json=task(1))
+            assert response.json() == {"replica": "replica-1"}
+
+    asyncio.run(scenario())
+
+
+def test_failing_backend_is_ejected(router):
+    router.replicas.task_status["replica-0"] = 500
+
+    async def scenario():
+        async with router.lifespan(router.app), client(router.app) as c:
+            await wait_until(lambda: len(router.pool.available()) == 3)
+            for i in range(30):
+                await c.post("/robot/task", json=task(i))
+            served_before = router.replicas.served["replica-0"]
+            for i in range(30):
+                assert (await c.post("/robot/task", json=task(i))).status_code == 200
+            status = {backend["url"]: backend for backend in (await c.get("/router/status")).json()["backends"]}
+            return served_before, status
+
+    served_before, status = asyncio.run(scenario())
+    assert served_before == 2  # eject_after consecutive failures
+    assert router.replicas.served["replica-0"] == 2
+    assert status["http://replica-0:8000"]["ejected"]
+    assert not status["http://replica-1:8000"]["ejected"]
+
+
+def test_unreachable_backend_is_retried_elsewhere(router):
+    router.replicas.unreachable.add("replica-2")
+    # One health check at startup, then none during the test
+    router.router_config["health_interval"] = 60.0
+
+    async def scenario():
+        async with router.lifespan(router.app), client(router.app) as c:
+            await wait_until(lambda: len(router.pool.available()) == 2)
+            # Pretend the replica went down after its last health check
+            router.pool.backends[2].healthy = True
+            for i in range(30):
+                response = await c.post("/robot/task", json=task(i))
+                assert response.status_code == 200
+                assert response.json()["replica"] != "replica-2"
+
+    asyncio.run(scenario())
+    # Connection errors count as failures too, so the replica got ejected
+    assert router.pool.backends[2].failures == 2
+    assert not router.pool.backends[2].available(time.monotonic())
+
+
+def test_affinity_keeps_a_scene_on_one_backend(router):
+    router.router_config["policy"] = "affinity"
+
+    async def scenario():
+        async with router.lifespan(router.app), client(router.app) as c:
+            await wait_until(lambda: len(router.pool.available()) == 3)
+            placements = {}
+            for scene in range(20):
+                # Sequential requests: no backend is loaded, so the preferred one always wins
+                replicas = {(await c.post("/robot/task", json=task(scene))).json()["replica"] for _ in range(3)}
+                assert len(replicas) == 1
+                placements[scene] = replicas.pop()
+            return placements
+
+    placements = asyncio.run(scenario())
+    # Different scenes still spread over the replicas
+    assert len(set(placements.values())) > 1
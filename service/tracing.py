@@ -0,0 +1,110 @@
+"""
+Per-request stage timings, a log of the slowest requests, and a sampling profiler.
+
+Tracing costs a handful of perf_counter() calls per request; the profiler
+only runs inside the window an operator asks for.
+"""
+import sys
+import time
+import heapq
+import threading
+import itertools
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class RequestTrace:
+    """Timings of one request, split into the stages it went through."""
+
+    __slots__ = ("trace_id", "started_at", "start", "last", "stages", "info", "payload")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.start = self.last = time.perf_counter()
+        self.stages = {}
+        self.info = {}
+        # Decoded request body, set only when the request is sampled for traffic capture
+        self.payload = None
+
+    def mark(self, stage: str):
+        """Attribute the time since the previous mark to stage."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last)
+        self.last = now
+
+    def total(self) -> float:
+        return self.last - self.start
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "total_ms": self.total() * 1000,
+            "stages_ms": {stage: seconds * 1000 for stage, seconds in self.stages.items()},
+            **self.info,
+        }
+
+
+class SlowRequestLog:
+    """Keeps the `size` slowest traces seen so far in a bounded min-heap."""
+
+    def __init__(self, size: int = 50):
+        self.size = size
+        self._heap = []
+        self._counter = itertools.count()
+
+    def record(self, trace: RequestTrace):
+        if self.size <= 0:
+            return
+        total = trace.total()
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, (total, next(self._counter), trace))
+        elif total > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (total, next(self._counter), trace))
+
+    def snapshot(self) -> List[Dict]:
+        return [trace.to_dict() for _, _, trace in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+    def clear(self):
+        self._heap.clear()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, thread_ids: Optional[set] = None) -> Counter:
+    """
+    Sample the Python stacks of the process' threads for a bounded window.
+
+    Args:
+        seconds: Length of the profiling window
+        interval: Seconds between samples
+        thread_ids: Only sample these threads (all other threads by default)
+
+    Returns:
+        Counter of folded stacks ("thread;outer;...;inner") to sample counts
+    """
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me or (thread_ids is not None and thread_id not in thread_ids):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def format_folded(counts: Counter) -> str:
+    """Render folded stacks in the format flamegraph.pl and speedscope read."""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,213 @@
+"""
+Opt-in capture of production traffic to rotating gzip JSONL files.
+
+Requests are offered to a bounded queue without ever waiting: when the queue
+is full the record is dropped and counted. A background task drains the
+queue in batches and hands them to a single writer thread, so serialization,
+compression and disk I/O stay off the event loop.
+
+The open file is flushed after every batch and rotated by record count and
+age, so a crash loses at most the batch being written. Files left behind as
+.part by a crashed process are renamed into place on the next start once
+they are old enough that no live writer can still own them, and readers
+accept their missing gzip trailer.
+"""
+import os
+import json
+import gzip
+import glob
+import time
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger("robot-reasoning-api")
+
+CAPTURE_SUFFIX = ".jsonl.gz"
+
+
+class TrafficRecorder:
+    """
+    Samples requests into a bounded queue and writes them to rotating compressed files.
+
+    Args:
+        directory: Directory for the capture files
+        sample_rate: Fraction of requests to record
+        queue_size: Records buffered before new ones are dropped
+        max_records: Records per file before rotating to a new one
+        max_seconds: Seconds a file stays open before rotating to a new one
+        batch_size: Records handed to the writer thread at once
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 1.0, queue_size: int = 1000,
+                 max_records: int = 10000, max_seconds: float = 600.0, batch_size: int = 100):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        self.max_seconds = max_seconds
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(queue_size)
+        self.stats = {"recorded": 0, "dropped": 0, "files": 0, "recovered": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="traffic-writer")
+        self._file = None
+        self._path = None
+        self._records_in_file = 0
+        self._opened_at = 0.0
+        self._task = None
+        os.makedirs(directory, exist_ok=True)
+        # A live writer touches its file at least every max_seconds, so anything older is abandoned
+        self.stats["recovered"] = recover_partial_files(directory, 2 * max_seconds)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def offer(self, record: Dict) -> bool:
+        """Queue a record for writing; drops it instead of waiting when the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Write out whatever is still queued and close the current file."""
+        if self._task is not None:
+            self._task.cancel()
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        loop = asyncio.get_running_loop()
+        # The single writer thread runs these after any batch already in flight
+        if batch:
+            await loop.run_in_executor(self._executor, self._write, batch)
+        await loop.run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Wakes up when idle so that an open file is still rotated on time
+                batch = [await asyncio.wait_for(self.queue.get(), self.max_seconds)]
+            except asyncio.TimeoutError:
+                batch = []
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+            except Exception as e:
+                logger.error(f"Failed to write captured traffic: {e}")
+
+    def _write(self, batch: List[Dict]):
+        for record in batch:
+            try:
+                if self._file is not None and time.monotonic() - self._opened_at >= self.max_seconds:
+                    self._close_file()
+                if self._file is None:
+                    self._open_file()
+                self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            except Exception as e:
+                # One bad record (or a failed write) must not take the rest of the batch with it
+                self.stats["dropped"] += 1
+                logger.error(f"Failed to capture request {record.get('trace_id')}: {e}")
+                continue
+            self._records_in_file += 1
+            self.stats["recorded"] += 1
+            if self._records_in_file >= self.max_records:
+                self._close_file()
+        if self._file is not None:
+            if time.monotonic() - self._opened_at >= self.max_seconds:
+                self._close_file()
+            else:
+                # Sync-flushes the gzip stream, so everything written so far survives a crash
+                self._file.flush()
+
+    def _open_file(self):
+        while True:
+            name = f"traffic-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.stats['files']:05d}{CAPTURE_SUFFIX}"
+            self._path = os.path.join(self.directory, name)
+            # A restarted process can get the same pid (e.g. 1 in a container); never overwrite its files
+            if not os.path.exists(self._path) and not os.path.exists(self._path + ".part"):
+                break
+            self.stats["files"] += 1
+        # Written under a temporary name so readers only ever see complete files
+        self._file = gzip.open(self._path + ".part", "wt")
+        self._records_in_file = 0
+        self._opened_at = time.monotonic()
+        self.stats["files"] += 1
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        try:
+            file.close()
+        finally:
+            os.replace(self._path + ".part", self._path)
+
+
+def recover_partial_files(directory: str, min_age: float) -> int:
+    """
+    Rename .part files left behind by a crashed recorder into place.
+
+    Args:
+        directory: Capture directory
+        min_age: Only files not modified for this many seconds are recovered
+
+    Returns:
+        Number of recovered files
+    """
+    recovered = 0
+    for part in glob.glob(os.path.join(directory, "*" + CAPTURE_SUFFIX + ".part")):
+        try:
+            if time.time() - os.path.getmtime(part) < min_age:
+                continue
+            os.replace(part, part[:-len(".part")])
+        except OSError as e:
+            logger.warning(f"Could not recover {part}: {e}")
+            continue
+        logger.info(f"Recovered partial capture file {part}")
+        recovered += 1
+    return recovered
+
+
+def capture_files(paths: List[str]) -> List[str]:
+    """Expand directories into the capture files they contain, in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*" + CAPTURE_SUFFIX))))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_records(paths: List[str], limit: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Yield captured records from capture files or directories.
+
+    Files recovered after a crash have no gzip trailer and may end in a
+    partial line; their complete records are read and the rest is skipped.
+    """
+    count = 0
+    for path in capture_files(paths):
+        with gzip.open(path, "rt") as f:
+            try:
+                for line in f:
+                    if limit is not None and count >= limit:
+                        return
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping a truncated record in {path}")
+                        continue
+                    yield record
+                    count += 1
+            except EOFError:
+                logger.warning(f"{path} ends without a gzip trailer, read up to the last complete record")
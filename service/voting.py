@@ -0,0 +1,68 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+def action_key(actions: List[List[int]]) -> Tuple:
+    """Hashable form of an action sequence, used to count identical completions."""
+    return tuple(tuple(action) for action in actions)
+
+
+def per_step_majority(action_sequences: List[List[List[int]]]) -> List[List[int]]:
+    """
+    Majority-vote every value of every step across sequences of the most common length.
+
+    Ties are broken in favour of the value from the earliest completion.
+    """
+    length = Counter(len(actions) for actions in action_sequences).most_common(1)[0][0]
+    candidates = [actions for actions in action_sequences if len(actions) == length]
+    voted = []
+    for step in range(length):
+        voted.append([
+            Counter(actions[step][dim] for actions in candidates).most_common(1)[0][0]
+            for dim in range(len(candidates[0][step]))
+        ])
+    return voted
+
+
+def vote_actions(action_sequences: List[List[List[int]]]) -> Tuple[int, List[List[int]], Dict]:
+    """
+    Choose the consensus action sequence among several completions of the same prompt.
+
+    The most common exact sequence wins when at least two completions agree on
+    it. Otherwise every value is majority-voted per step, and the completion
+    closest to that vote is reported as the source of the raw output.
+
+    Args:
+        action_sequences: Parsed actions of each completion, in completion order
+
+    Returns:
+        A tuple of the index of the chosen completion, the voted actions and agreement stats
+    """
+    valid = [(i, actions) for i, actions in enumerate(action_sequences) if actions]
+    stats = {"completions": len(action_sequences), "valid": len(valid), "distinct": 0, "votes": 0, "agreement": 0.0}
+    if not valid:
+        stats["method"] = "none"
+        return 0, [], stats
+
+    counts = Counter(action_key(actions) for _, actions in valid)
+    best_key, votes = counts.most_common(1)[0]
+    stats["distinct"] = len(counts)
+    if votes > 1 or len(valid) == 1:
+        index = next(i for i, actions in valid if action_key(actions) == best_key)
+        voted = action_sequences[index]
+        stats["method"] = "exact"
+    else:
+        voted = per_step_majority([actions for _, actions in valid])
+
+        def distance(item):
+            _, actions = item
+            if len(actions) != len(voted):
+                return float("inf")
+            return sum(abs(a - b) for step, voted_step in zip(actions, voted) for a, b in zip(step, voted_step))
+
+        index = min(valid, key=distance)[0]
+        votes = counts.get(action_key(voted), 0)
+        stats["method"] = "per_step"
+    stats["votes"] = votes
+    stats["agreement"] = votes / len(valid)
+    return index, voted, stats
@@ -0,0 +1,110 @@
+"""
+Request/response encodings for the API.
+
+JSON is always available and goes through orjson when it is installed.
+msgpack is offered when the msgpack package is installed; clients pick it
+with Content-Type / Accept: application/msgpack.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def media_type(header: Optional[str]) -> str:
+    """Map a Content-Type header to JSON or MSGPACK."""
+    if header and msgpack is not None and header.split(";")[0].strip().lower() in MSGPACK_TYPES:
+        return MSGPACK
+    return JSON
+
+
+def parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """Split an Accept header into (media range, q-value) pairs in header order."""
+    ranges = []
+    for part in accept.split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = min(1.0, max(0.0, float(value)))
+                except ValueError:
+                    pass  # a malformed q-value is ignored rather than failing the request
+        ranges.append((name, quality))
+    return ranges
+
+
+def negotiate(accept: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Pick the response encoding from the Accept header.
+
+    Each encoding gets the q-value of the most specific media range matching
+    it (exact type, then application/*, then */*). The highest q-value wins
+    and ties go to the range listed first, then to the request's own
+    encoding. Without an Accept header, or when it accepts neither encoding,
+    the response uses the request's own encoding.
+    """
+    default = media_type(content_type)
+    if not accept:
+        return default
+    ranges = parse_accept(accept)
+    available = [default] + [media for media in (JSON, MSGPACK)
+                             if media != default and (media == JSON or msgpack is not None)]
+    best, best_key = default, None
+    for media in available:
+        names = MSGPACK_TYPES if media == MSGPACK else (JSON,)
+        match = None  # (specificity, q-value, position) of the most specific matching range
+        for position, (name, quality) in enumerate(ranges):
+            specificity = 2 if name in names else 1 if name == "application/*" else 0 if name == "*/*" else None
+            if specificity is not None and (match is None or specificity > match[0]):
+                match = (specificity, quality, position)
+        if match is None or match[1] <= 0:
+            continue
+        key = (match[1], -match[2])
+        if best_key is None or key > best_key:
+            best, best_key = media, key
+    return best
+
+
+def decode(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    Decode a request body.
+
+    Raises:
+        ValueError: If the body is not valid in its declared encoding
+    """
+    if media_type(content_type) == MSGPACK:
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack body: {e}") from None
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}") from None
+    return json.loads(body)
+
+
+def encode(payload: Any, media: str) -> bytes:
+    if media == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
@@ -0,0 +1,246 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_REPO_ID = "jan-hq/Pick-Place-Table-Reasoning-local-pos-v0.2"
+
+
+def shard_name(index):
+    return f"shard-{index:05d}.jsonl"
+
+
+def shard_seed(base_seed, index):
+    """
+    Derive a stable per-shard seed so that a shard regenerated on resume is
+    identical to the one a completed run would have produced.
+    """
+    digest = hashlib.sha256(f"{base_seed}:{index}".encode()).hexdigest()
+    return int(digest[:16], 16)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def plan_shards(task_counts, shard_size):
+    """
+    Split the per-task sample counts into shards of roughly shard_size samples.
+
+    Every task is spread evenly over all shards so that each shard carries the
+    same task mix, and the per-task totals over all shards are exact.
+
+    Args:
+        task_counts: Dictionary mapping task name to the total number of samples
+        shard_size: Target number of samples per shard
+
+    Returns:
+        List of dictionaries, one per shard, mapping task name to sample count
+    """
+    if shard_size <= 0:
+        raise ValueError("shard_size must be positive")
+    total = sum(task_counts.values())
+    num_shards = max(1, -(-total // shard_size))
+    shards = []
+    for index in range(num_shards):
+        counts = {}
+        for task, count in task_counts.items():
+            counts[task] = count * (index + 1) // num_shards - count * index // num_shards
+        shards.append(counts)
+    return shards
+
+
+def new_manifest(task_counts, shard_size, base_seed, grid=(100, 25), shuffle_buffer=None):
+    return {
+        "version": MANIFEST_VERSION,
+        "base_seed": base_seed,
+        "shard_size": shard_size,
+        "task_counts": dict(task_counts),
+        "grid": list(grid),
+        "shuffle_buffer": shuffle_buffer,
+        "shards": {},
+        "uploads": {},
+    }
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    """Atomically replace the manifest so that a crash never leaves it half-written."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def check_resumable(manifest, task_counts, shard_size, base_seed, grid=(100, 25), shuffle_buffer=None):
+    """Raise ValueError if an existing manifest was produced with a different plan."""
+    expected = {
+        "version": MANIFEST_VERSION,
+        "base_seed": base_seed,
+        "shard_size": shard_size,
+        "task_counts": dict(task_counts),
+        "grid": list(grid),
+        "shuffle_buffer": shuffle_buffer,
+    }
+    for key, value in expected.items():
+        if manifest.get(key) != value:
+            raise ValueError(
+                f"Cannot resume: manifest {key}={manifest.get(key)!r} does not match requested {value!r}"
+            )
+
+
+def shard_is_complete(output_dir, entry):
+    """A shard is complete when its file exists and still matches the recorded checksum."""
+    if entry is None:
+        return False
+    path = os.path.join(output_dir, entry["path"])
+    if not os.path.exists(path) or os.path.getsize(path) != entry["bytes"]:
+        return False
+    return file_sha256(path) == entry["sha256"]
+
+
+def write_shard(output_dir, index, samples):
+    """
+    Stream samples to a JSONL shard file and return its manifest entry.
+
+    The file is written under a temporary name and renamed only once it is
+    complete, so a shard file on disk is never partial.
+
+    Args:
+        output_dir: Directory holding the shards and the manifest
+        index: Shard index
+        samples: Iterable of data samples
+
+    Returns:
+        Dictionary with the shard path, sample count, size and checksum
+    """
+    name = shard_name(index)
+    path = os.path.join(output_dir, name)
+    tmp_path = path + ".tmp"
+    sha = hashlib.sha256()
+    num_samples = 0
+    num_bytes = 0
+    with open(tmp_path, "wb") as f:
+        for sample in samples:
+            line = (json.dumps(sample) + "\n").encode()
+            f.write(line)
+            sha.update(line)
+            num_samples += 1
+            num_bytes += len(line)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return {
+        "path": name,
+        "num_samples": num_samples,
+        "bytes": num_bytes,
+        "sha256": sha.hexdigest(),
+    }
+
+
+def iter_shard(output_dir, entry):
+    with open(os.path.join(output_dir, entry["path"])) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _upload_to_local_dir(output_dir, entry, local_dir):
+    destination = os.path.join(local_dir, entry["path"])
+    if os.path.exists(destination) and file_sha256(destination) == entry["sha256"]:
+        return False
+    tmp_path = destination + ".tmp"
+    shutil.copyfile(os.path.join(output_dir, entry["path"]), tmp_path)
+    os.replace(tmp_path, destination)
+    return True
+
+
+def push_shards(output_dir, repo_id=None, local_dir=None, split="train"):
+    """
+    Upload completed shards one by one to the Hugging Face Hub or a local directory.
+
+    Uploads are recorded per target in the manifest, so rerunning after a
+    failure only sends the shards that have not been uploaded yet (or whose
+    contents changed since).
+
+    Args:
+        output_dir: Directory holding the shards and the manifest
+        repo_id: Hub dataset repository to upload to
+        local_dir: Local directory to copy shards into instead of the Hub
+        split: Dataset split the shards belong to
+
+    Returns:
+        Number of shards uploaded in this call
+    """
+    if (repo_id is None) == (local_dir is None):
+        raise ValueError("Exactly one of repo_id or local_dir must be given")
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No {MANIFEST_NAME} found in {output_dir}")
+
+    if repo_id is not None:
+        from huggingface_hub import HfApi
+
+        api = HfApi()
+        api.create_repo(repo_id, repo_type="dataset", exist_ok=True)
+        target = f"hub:{repo_id}"
+    else:
+        os.makedirs(local_dir, exist_ok=True)
+        target = f"local:{os.path.abspath(local_dir)}"
+
+    uploaded = manifest.setdefault("uploads", {}).setdefault(target, {})
+    num_uploaded = 0
+    for key in sorted(manifest["shards"]):
+        entry = manifest["shards"][key]
+        if repo_id is not None:
+            if uploaded.get(key) == entry["sha256"]:
+                continue
+            api.upload_file(
+                path_or_fileobj=os.path.join(output_dir, entry["path"]),
+                path_in_repo=f"data/{split}/{entry['path']}",
+                repo_id=repo_id,
+                repo_type="dataset",
+                commit_message=f"Add {split} {entry['path']}",
+            )
+            changed = True
+        else:
+            changed = _upload_to_local_dir(output_dir, entry, local_dir)
+        if changed:
+            num_uploaded += 1
+            print(f"Uploaded {entry['path']} to {target}")
+        uploaded[key] = entry["sha256"]
+        save_manifest(output_dir, manifest)
+    return num_uploaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload generated shards to the Hub or a local directory.')
+    parser.add_argument('--output-dir', type=str, default='synthetic_robotic_data', help='Directory with the shards and manifest')
+    parser.add_argument('--repo-id', type=str, default=None, help=f'Hub dataset repository (e.g. {DEFAULT_REPO_ID})')
+    parser.add_argument('--local-dir', type=str, default=None, help='Copy shards to this directory instead of the Hub')
+    parser.add_argument('--split', type=str, default='train', help='Dataset split name')
+
+    args = parser.parse_args()
+
+    num_uploaded = push_shards(args.output_dir, repo_id=args.repo_id, local_dir=args.local_dir, split=args.split)
+    print(f"Uploaded {num_uploaded} shard(s); all shards are up to date")
+
+
+if __name__ == "__main__":
+    main()
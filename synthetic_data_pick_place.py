@@ -1,26 +1,44 @@
 import random
 import json
 import math
+import os
 import argparse
-from datasets import Dataset
+from functools import partial
+from shards import (
+    DEFAULT_REPO_ID,
+    check_resumable,
+    iter_shard,
+    load_manifest,
+    new_manifest,
+    plan_shards,
+    save_manifest,
+    shard_is_complete,
+    shard_seed,
+    write_shard
+)
+from task_mix import DEFAULT_SHUFFLE_BUFFER, mix_tasks
 from utils import (
-    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_TEMPLATE,
     objects,
     colors,
-    Thinking_Format_Move,
+    Thinking_Format_Move_Template,
     Thinking_Format_Place,
     Thinking_Format_Stack,
+    EPISODE_TURN_TEMPLATE,
     tokenize_desk
 )
+from service.grid import DEFAULT_GRID, GridSpec
+from service.scene import DeskState, Scene, render_desk
     
 
-def convert_solution(actions, to_tokenized=True):
+def convert_solution(actions, to_tokenized=True, spec=DEFAULT_GRID):
     """
-    Convert a solution from 100x100 format to 25x25 format with tokenized positioning
+    Convert a solution from workspace format (100x100 by default) to global/local grid format with tokenized positioning
     
     Args:
-        actions: List of 7D actions in format [x_100, y_100, z, roll, pitch, yaw, gripper]
+        actions: List of 7D actions in format [x, y, z, roll, pitch, yaw, gripper]
         to_tokenized: If True, convert to <row-col> format, otherwise use (row,col)
+        spec: The grid spec to convert to
         
     Returns:
         List of converted actions
@@ -28,51 +46,45 @@ def convert_solution(actions, to_tokenized=True):
     converted_actions = []
     
     for action in actions:
-        x_100, y_100, z, roll, pitch, yaw, gripper = action
+        x, y, z, roll, pitch, yaw, gripper = action
         
-        # Convert from 100x100 to 25x25
-        x_25 = x_100 // 4
-        y_25 = y_100 // 4
-        local_x_25 = x_100 % 4
-        local_y_25 = y_100 % 4
+        # Convert from workspace to global/local grid
+        row, col, local_row, local_col = spec.discretize(x, y)
         
         if to_tokenized:
             # Format as <|row-col|>
-            position = f"<|{x_25}-{y_25}|>"
-            local_pos = f"<|local-{local_x_25}-{local_y_25}|>"
+            position = f"<|{row}-{col}|>"
+            local_pos = f"<|local-{local_row}-{local_col}|>"
             converted_action = [position, local_pos, z, roll, pitch, yaw, gripper]
         else:
             # Format as tuple (row,col)
-            converted_action = [(x_25, y_25), (local_x_25, local_y_25), z, roll, pitch, yaw, gripper]
+            converted_action = [(row, col), (local_row, local_col), z, roll, pitch, yaw, gripper]
             
         converted_actions.append(converted_action)
     
     return converted_actions
 
-def discretize_object(objects_pos: list):
-    x_100, y_100, z = objects_pos
-    x_25 = x_100 // 4
-    y_25 = y_100 // 4
-    local_x_25 = x_100 % 4
-    local_y_25 = y_100 % 4
-    position = f"<|{x_25}-{y_25}|><|local-{local_x_25}-{local_y_25}|>"
+def discretize_object(objects_pos: list, spec=DEFAULT_GRID):
+    x, y, z = objects_pos
+    position = "".join(spec.position_tokens(x, y))
     converted_object = [position, z]
     return converted_object
 
-def generate_task_unique(task_type):
+def generate_task_unique(task_type, spec=DEFAULT_GRID):
     """
     Generate synthetic robotic data samples with unique objects (except containers).
     
     Args:
         task_type: Type of task to generate (placing, move, stack)
+        spec: The workspace grid spec
         
     Returns:
         Dictionary of generated data sample
     """
-    global objects, colors, SYSTEM_PROMPT, Thinking_Format_Stack, Thinking_Format_Place
+    global objects, colors, SYSTEM_PROMPT_TEMPLATE, Thinking_Format_Stack, Thinking_Format_Place
     
     num_objects = random.randint(4, 6)
-    scene_objects = []
+    scene = Scene()
     used_descriptions = set()
     positions = []
     source_obj = []
@@ -87,13 +99,14 @@ def generate_task_unique(task_type):
         used_object_types.add(target_object_type)
         
     target_color = random.choice(colors)
-    target_desc = f"{target_color}-{target_object_type}"
-    target_x = random.randint(0, 98)
-    target_y = random.randint(0, 98)
+    target_desc = (target_color, target_object_type)
+    max_coord = spec.workspace - 2
+    target_x = random.randint(0, max_coord)
+    target_y = random.randint(0, max_coord)
     target_z = random.randint(1, 30)
     target_position = [target_x, target_y, target_z]
-    target_discrete_pos = discretize_object(target_position)
-    scene_objects.append({target_desc: target_position})
+    target_discrete_pos = discretize_object(target_position, spec)
+    scene.add(target_color, target_object_type, *target_position)
     target_obj.append({f"<|{target_color}|><|{target_object_type}|>": target_discrete_pos})
     used_descriptions.add(target_desc)
     positions.append((target_x, target_y))
@@ -107,17 +120,17 @@ def generate_task_unique(task_type):
         used_object_types.add(source_object_type)
         
     source_color = random.choice(colors)
-    source_desc = f"{source_color}-{source_object_type}"
+    source_desc = (source_color, source_object_type)
     
     while source_desc in used_descriptions:
         source_color = random.choice(colors)
-        source_desc = f"{source_color}-{source_object_type}"
+        source_desc = (source_color, source_object_type)
     
-    source_x, source_y = generate_position_with_min_distance(positions, 4)
+    source_x, source_y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
     source_z = random.randint(1, 30)
     source_position = [source_x, source_y, source_z]
-    source_discrete_pos = discretize_object(source_position)
-    scene_objects.append({source_desc: source_position})
+    source_discrete_pos = discretize_object(source_position, spec)
+    scene.add(source_color, source_object_type, *source_position)
     source_obj.append({f"<|{source_color}|><|{source_object_type}|>": source_discrete_pos})
     used_descriptions.add(source_desc)
     positions.append((source_x, source_y))
@@ -127,17 +140,17 @@ def generate_task_unique(task_type):
         num_extra_containers = random.randint(1, 2)
         for _ in range(num_extra_containers):
             extra_container_color = random.choice(colors)
-            extra_container_desc = f"{extra_container_color}-container"
+            extra_container_desc = (extra_container_color, "container")
             
             # Ensure we don't duplicate container colors
             while extra_container_desc in used_descriptions:
                 extra_container_color = random.choice(colors)
-                extra_container_desc = f"{extra_container_color}-container"
+                extra_container_desc = (extra_container_color, "container")
             
-            extra_x, extra_y = generate_position_with_min_distance(positions, 4)
+            extra_x, extra_y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
             extra_z = random.randint(1, 30)
             
-            scene_objects.append({extra_container_desc: [extra_x, extra_y, extra_z]})
+            scene.add(extra_container_color, "container", extra_x, extra_y, extra_z)
             used_descriptions.add(extra_container_desc)
             positions.append((extra_x, extra_y))
     
@@ -157,20 +170,20 @@ def generate_task_unique(task_type):
             used_object_types.add(obj)
             
         color = random.choice(colors)
-        desc = f"{color}-{obj}"
+        desc = (color, obj)
         
         while desc in used_descriptions:
             color = random.choice(colors)
-            desc = f"{color}-{obj}"
+            desc = (color, obj)
         
-        x, y = generate_position_with_min_distance(positions, 4)
+        x, y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
         z = random.randint(1, 30)
         
-        scene_objects.append({desc: [x, y, z]})
+        scene.add(color, obj, x, y, z)
         used_descriptions.add(desc)
         positions.append((x, y))
     
-    random.shuffle(scene_objects)
+    scene.shuffle()
     
     # Create instruction based on task type
     if task_type == "placing":
@@ -201,11 +214,11 @@ def generate_task_unique(task_type):
         [target_x, target_y, end_z, roll, pitch, yaw, 0],
         [target_x, target_y, end_z, roll, pitch, yaw, 1]  # Open gripper to release object
     ]
-    converted_solution = convert_solution(solutions)
+    converted_solution = convert_solution(solutions, spec=spec)
     if task_type=="placing":
         think_answer = Thinking_Format_Place.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=f"<|{target_color}|><|{target_object_type}|>", target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     elif task_type=="move":
-        think_answer = Thinking_Format_Move.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_con_pos=target_position[:2], target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
+        think_answer = spec.fill(Thinking_Format_Move_Template).format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_con_pos=target_position[:2], target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     else:
         think_answer = Thinking_Format_Stack.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=f"<|{target_color}|><|{target_object_type}|>", target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     answer=""
@@ -216,15 +229,15 @@ def generate_task_unique(task_type):
             break
         answer +=f"Step {i+1}: {solution_str}\n"
     final_answer=f"<think>\n{think_answer}\n</think>\n\n{answer}"
-    desk, object_height = tokenize_desk(scene_objects)
-    text = SYSTEM_PROMPT.format(object_height=object_height,instruction=instruction,TABLE_MAP=desk)
+    desk, object_height = render_desk(scene, spec)
+    text = spec.fill(SYSTEM_PROMPT_TEMPLATE).format(object_height=object_height,instruction=instruction,TABLE_MAP=desk)
     user_part = {"content": text.strip(), "role": "user"}
     assistant_part = {"content": final_answer.strip(), "role": "assistant"}
     data_sample = {
         "Source_Obj": json.dumps(source_obj),
         "Target_Obj": json.dumps(target_obj),
         "Thinking": think_answer,
-        "Object": json.dumps(scene_objects),
+        "Object": json.dumps(scene.to_json()),
         "instruction": instruction,
         "solution": solutions,
         "Conversation": [user_part, assistant_part]
@@ -232,20 +245,21 @@ def generate_task_unique(task_type):
     
     return data_sample
 
-def generate_task(task_type):
+def generate_task(task_type, spec=DEFAULT_GRID):
     """
     Generate synthetic robotic data samples.
     
     Args:
-        num_samples: Number of data samples to generate
+        task_type: Type of task to generate (placing, move, stack)
+        spec: The workspace grid spec
         
     Returns:
         List of generated data samples
     """
-    global objects, colors, SYSTEM_PROMPT, Thinking_Format_Stack, Thinking_Format_Place
+    global objects, colors, SYSTEM_PROMPT_TEMPLATE, Thinking_Format_Stack, Thinking_Format_Place
     
     num_objects = random.randint(5, 7)
-    scene_objects = []
+    scene = Scene()
     used_descriptions = set()
     positions = []
     source_obj = []
@@ -257,13 +271,14 @@ def generate_task(task_type):
     else:
         target_object_type = random.choice(objects)
     target_color = random.choice(colors)
-    target_desc = f"{target_color}-{target_object_type}"
-    target_x = random.randint(0, 98)
-    target_y = random.randint(0, 98)
+    target_desc = (target_color, target_object_type)
+    max_coord = spec.workspace - 2
+    target_x = random.randint(0, max_coord)
+    target_y = random.randint(0, max_coord)
     target_z = random.randint(1, 30)
     target_position = [target_x, target_y, target_z]
-    target_discrete_pos = discretize_object(target_position)
-    scene_objects.append({target_desc: target_position})
+    target_discrete_pos = discretize_object(target_position, spec)
+    scene.add(target_color, target_object_type, *target_position)
     target_obj.append({f"<|{target_color}|><|{target_object_type}|>": target_discrete_pos})
     used_descriptions.add(target_desc)
     positions.append((target_x, target_y))
@@ -271,18 +286,18 @@ def generate_task(task_type):
     # Setup source object
     source_object_type = random.choice(objects)
     source_color = random.choice(colors)
-    source_desc = f"{source_color}-{source_object_type}"
+    source_desc = (source_color, source_object_type)
     
     while source_desc in used_descriptions:
         source_color = random.choice(colors)
         source_object_type = random.choice(objects)
-        source_desc = f"{source_color}-{source_object_type}"
+        source_desc = (source_color, source_object_type)
     
-    source_x, source_y = generate_position_with_min_distance(positions, 4)
+    source_x, source_y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
     source_z = random.randint(1, 30)
     source_position = [source_x, source_y, source_z]
-    source_discrete_pos = discretize_object(source_position)
-    scene_objects.append({source_desc: source_position})
+    source_discrete_pos = discretize_object(source_position, spec)
+    scene.add(source_color, source_object_type, *source_position)
     source_obj.append({f"<|{source_color}|><|{source_object_type}|>": source_discrete_pos})
     used_descriptions.add(source_desc)
     positions.append((source_x, source_y))
@@ -292,17 +307,17 @@ def generate_task(task_type):
         num_extra_containers = random.randint(1, 2)
         for _ in range(num_extra_containers):
             extra_container_color = random.choice(colors)
-            extra_container_desc = f"{extra_container_color}-container"
+            extra_container_desc = (extra_container_color, "container")
             
             # Ensure we don't duplicate container colors
             while extra_container_desc in used_descriptions:
                 extra_container_color = random.choice(colors)
-                extra_container_desc = f"{extra_container_color}-container"
+                extra_container_desc = (extra_container_color, "container")
             
-            extra_x, extra_y = generate_position_with_min_distance(positions, 4)
+            extra_x, extra_y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
             extra_z = random.randint(1, 30)
             
-            scene_objects.append({extra_container_desc: [extra_x, extra_y, extra_z]})
+            scene.add(extra_container_color, "container", extra_x, extra_y, extra_z)
             used_descriptions.add(extra_container_desc)
             positions.append((extra_x, extra_y))
     
@@ -315,21 +330,21 @@ def generate_task(task_type):
     for _ in range(remaining_objects):
         obj = random.choice(objects)
         color = random.choice(colors)
-        desc = f"{color}-{obj}"
+        desc = (color, obj)
         
         while desc in used_descriptions:
             color = random.choice(colors)
             obj = random.choice(objects)
-            desc = f"{color}-{obj}"
+            desc = (color, obj)
         
-        x, y = generate_position_with_min_distance(positions, 4)
+        x, y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
         z = random.randint(1, 30)
         
-        scene_objects.append({desc: [x, y, z]})
+        scene.add(color, obj, x, y, z)
         used_descriptions.add(desc)
         positions.append((x, y))
     
-    random.shuffle(scene_objects)
+    scene.shuffle()
     
     # Create instruction based on task type
     if task_type == "placing":
@@ -360,11 +375,11 @@ def generate_task(task_type):
         [target_x, target_y, end_z, roll, pitch, yaw, 0],
         [target_x, target_y, end_z, roll, pitch, yaw, 1]  # Open gripper to release object
     ]
-    converted_solution = convert_solution(solutions)
+    converted_solution = convert_solution(solutions, spec=spec)
     if task_type=="placing":
         think_answer = Thinking_Format_Place.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=f"<|{target_color}|><|{target_object_type}|>", target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     elif task_type=="move":
-        think_answer = Thinking_Format_Move.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_con_pos=target_position[:2], target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
+        think_answer = spec.fill(Thinking_Format_Move_Template).format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_con_pos=target_position[:2], target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     else:
         think_answer = Thinking_Format_Stack.format(source_object=f"<|{source_color}|><|{source_object_type}|>", source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=f"<|{target_color}|><|{target_object_type}|>", target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
     answer=""
@@ -375,15 +390,15 @@ def generate_task(task_type):
             break
         answer +=f"Step {i+1}: {solution_str}\n"
     final_answer=f"<think>\n{think_answer}\n</think>\n\n{answer}"
-    desk, object_height = tokenize_desk(scene_objects)
-    text = SYSTEM_PROMPT.format(object_height=object_height,instruction=instruction,TABLE_MAP=desk)
+    desk, object_height = render_desk(scene, spec)
+    text = spec.fill(SYSTEM_PROMPT_TEMPLATE).format(object_height=object_height,instruction=instruction,TABLE_MAP=desk)
     user_part = {"content": text.strip(), "role": "user"}
     assistant_part = {"content": final_answer.strip(), "role": "assistant"}
     data_sample = {
         "Source_Obj": json.dumps(source_obj),
         "Target_Obj": json.dumps(target_obj),
         "Thinking": think_answer,
-        "Object": json.dumps(scene_objects),
+        "Object": json.dumps(scene.to_json()),
         "instruction": instruction,
         "solution": solutions,
         "Conversation": [user_part, assistant_part]
@@ -391,65 +406,309 @@ def generate_task(task_type):
     
     return data_sample
 
-def generate_position_with_min_distance(existing_positions, min_distance):
+def build_episode_scene(spec=DEFAULT_GRID):
+    """
+    Build the scene of an episode: 5-7 objects with unique descriptions, 1-2 of them containers.
+    
+    Args:
+        spec: The workspace grid spec
+        
+    Returns:
+        The Scene, in random order
+    """
+    scene = Scene()
+    used_descriptions = set()
+    positions = []
+    max_coord = spec.workspace - 2
+    num_objects = random.randint(5, 7)
+    num_containers = random.randint(1, 2)
+    for i in range(num_objects):
+        obj = "container" if i < num_containers else random.choice(objects)
+        color = random.choice(colors)
+        while (color, obj) in used_descriptions:
+            color = random.choice(colors)
+            if obj != "container":
+                obj = random.choice(objects)
+        
+        x, y = generate_position_with_min_distance(positions, spec.local_size, max_coord)
+        z = random.randint(1, 30)
+        
+        scene.add(color, obj, x, y, z)
+        used_descriptions.add((color, obj))
+        positions.append((x, y))
+    
+    scene.shuffle()
+    return scene
+
+def generate_episode(num_steps=None, spec=DEFAULT_GRID):
+    """
+    Generate a multi-step episode: a sequence of tasks applied to one scene.
+    
+    After every task the moved object is updated in the scene. A stacked
+    object's height becomes the top of the stack and the object below it is
+    covered; an object placed into a container disappears inside it. Only
+    uncovered objects standing on the table are picked up. The first task
+    shows the full desk; every later task adds a user turn listing only the
+    desk cells changed by the previous actions, and each task an assistant
+    turn with the plan and actions. Earlier turns are never rewritten, so consecutive turns share
+    their prompt prefix.
+    
+    Args:
+        num_steps: Number of tasks in the episode (random 2-4 by default)
+        spec: The workspace grid spec
+        
+    Returns:
+        Data sample with the initial scene, the details of every turn and the multi-turn Conversation
+    """
+    if num_steps is None:
+        num_steps = random.randint(2, 4)
+    scene = build_episode_scene(spec)
+    initial_objects = json.dumps(scene.to_json())
+    desk_state = DeskState(scene, spec)
+    stacked = set()    # objects standing on another object
+    contained = set()  # objects inside a container
+    covered = set()    # objects with another object on top
+    max_coord = spec.workspace - 2
+    roll, pitch, yaw = 0, 60, 90
+    turns = []
+    conversation = []
+    
+    for step in range(num_steps):
+        sources = [obj for obj in scene.objects
+                   if obj.object_type != "container" and obj not in stacked and obj not in contained and obj not in covered]
+        if not sources:
+            break
+        source = random.choice(sources)
+        containers = [obj for obj in scene.objects if obj.object_type == "container"]
+        stack_targets = [obj for obj in scene.objects
+                         if obj is not source and obj.object_type != "container" and obj not in contained and obj not in covered]
+        task_types = ["move"]
+        if containers:
+            task_types.append("placing")
+        if stack_targets:
+            task_types.append("stacking")
+        task_type = random.choice(task_types)
+        
+        source_x, source_y, source_z = source.position()
+        source_discrete_pos = discretize_object(source.position(), spec)
+        source_token = source.token
+        if task_type == "move":
+            others = [(obj.x, obj.y) for obj in scene.objects if obj is not source]
+            target_x, target_y = generate_position_with_min_distance(others, spec.local_size, max_coord)
+            target_z = random.randint(1, 30)
+            target_position = [target_x, target_y, target_z]
+            target_obj = []
+            instruction = f"Move the {source.color} {source.object_type} to {json.dumps(target_position)}"
+            end_z = target_z
+        else:
+            target = random.choice(containers if task_type == "placing" else stack_targets)
+            target_x, target_y, target_z = target.position()
+            target_position = target.position()
+            target_obj = [{target.token: discretize_object(target_position, spec)}]
+            if task_type == "placing":
+                instruction = f"Pick up the {source.color} {source.object_type} and place it into the {target.color} {target.object_type}"
+                end_z = target_z
+            else:
+                instruction = f"Stack the {source.color} {source.object_type} on top of the {target.color} {target.object_type}"
+                end_z = target_z + 1  # Position slightly above the target for stacking
+        target_discrete_pos = discretize_object(target_position, spec)
+        
+        solutions = [
+            [source_x, source_y, random.randint(source_z+10, max(source_z+10, 15)), roll, pitch, yaw, 1],  # Approach with gripper open
+            [source_x, source_y, 0, roll, pitch, yaw, 1],  # Move to object with gripper open
+            [source_x, source_y, 0, roll, pitch, yaw, 0],  # Close gripper to grasp object
+            [source_x, source_y, random.randint(source_z+10, max(source_z+10, 15)), roll, pitch, yaw, 0],  # Lift object with gripper closed
+            [target_x, target_y, random.randint(source_z+10, max(source_z+10, 15)), roll, pitch, yaw, 0],  # Move above target with gripper closed
+            [target_x, target_y, end_z, roll, pitch, yaw, 0],
+            [target_x, target_y, end_z, roll, pitch, yaw, 1]  # Open gripper to release object
+        ]
+        converted_solution = convert_solution(solutions, spec=spec)
+        if task_type == "placing":
+            think_answer = Thinking_Format_Place.format(source_object=source_token, source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=target.token, target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
+        elif task_type == "move":
+            think_answer = spec.fill(Thinking_Format_Move_Template).format(source_object=source_token, source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_con_pos=target_position[:2], target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
+        else:
+            think_answer = Thinking_Format_Stack.format(source_object=source_token, source_pos=source_discrete_pos[0], source_height=source_discrete_pos[1], target_object=target.token, target_pos=target_discrete_pos[0], target_height=target_discrete_pos[1])
+        answer = "\n".join(f"Step {i+1}: {json.dumps(solution)}" for i, solution in enumerate(converted_solution))
+        final_answer = f"<think>\n{think_answer}\n</think>\n\n{answer}"
+        
+        if step == 0:
+            template = SYSTEM_PROMPT_TEMPLATE
+            desk, object_height = desk_state.render()
+        else:
+            template = EPISODE_TURN_TEMPLATE
+            desk, object_height = desk_state.render_changes()
+        text = spec.fill(template).format(object_height=object_height, instruction=instruction, TABLE_MAP=desk)
+        conversation.append({"content": text.strip(), "role": "user"})
+        conversation.append({"content": final_answer.strip(), "role": "assistant"})
+        
+        # Apply the task to the scene
+        if task_type == "placing":
+            desk_state.move(source, target_x, target_y, source_z, visible=False)
+            contained.add(source)
+        elif task_type == "stacking":
+            desk_state.move(source, target_x, target_y, target_z + source_z)
+            stacked.add(source)
+            covered.add(target)
+        else:
+            desk_state.move(source, target_x, target_y, source_z)
+        
+        turns.append({
+            "task": task_type,
+            "Source_Obj": json.dumps([{source_token: source_discrete_pos}]),
+            "Target_Obj": json.dumps(target_obj),
+            "Thinking": think_answer,
+            "instruction": instruction,
+            "solution": solutions,
+            "Object": json.dumps(scene.to_json()),
+        })
+    
+    return {
+        "Object": initial_objects,
+        "Turns": turns,
+        "Conversation": conversation
+    }
+
+def generate_position_with_min_distance(existing_positions, min_distance, max_coord=98):
     while True:
-        x = random.randint(0, 98)
-        y = random.randint(0, 98)
+        x = random.randint(0, max_coord)
+        y = random.randint(0, max_coord)
         
         if all((abs(x - pos[0]) >= min_distance or abs(y - pos[1]) >= min_distance) for pos in existing_positions):
             return x, y
 
-def generate_robotic_data(num_placing_samples=5, num_stacking_samples=5, num_move_samples=5, number_unique_placing=70000, number_unique_stacking=30000):
-    data_samples = []
+def build_task_counts(num_placing_samples=5, num_stacking_samples=5, num_move_samples=5, number_unique_placing=70000, number_unique_stacking=30000):
+    return {
+        "placing": num_placing_samples,
+        "stacking": num_stacking_samples,
+        "move": num_move_samples,
+        "unique_placing": number_unique_placing,
+        "unique_stacking": number_unique_stacking,
+    }
+
+TASK_GENERATORS = {
+    "placing": partial(generate_task, "placing"),
+    "stacking": partial(generate_task, "stacking"),
+    "move": partial(generate_task, "move"),
+    "unique_placing": partial(generate_task_unique, "placing"),
+    "unique_stacking": partial(generate_task_unique, "stacking"),
+    "episode": generate_episode,
+}
+
+def generate_shard(counts, seed, spec=DEFAULT_GRID, shuffle_buffer=DEFAULT_SHUFFLE_BUFFER):
+    """
+    Generate the samples of one shard deterministically from its seed.
     
-    for _ in range(num_placing_samples):
-        data_samples.append(generate_task("placing"))
+    The task types are interleaved to their exact counts and decorrelated with
+    a bounded shuffle buffer, so at most shuffle_buffer samples are in memory.
     
-    for _ in range(num_stacking_samples):
-        data_samples.append(generate_task("stacking"))
-        
-    for _ in range(num_move_samples):
-        data_samples.append(generate_task("move"))
+    Args:
+        counts: Dictionary mapping task name to number of samples in this shard
+        seed: Seed for the shard
+        spec: The workspace grid spec
+        shuffle_buffer: Size of the shuffle buffer
         
-    for _ in range(number_unique_placing):
-        data_samples.append(generate_task_unique("placing"))
-    for _ in range(number_unique_stacking):
-        data_samples.append(generate_task_unique("stacking"))
-    random.shuffle(data_samples)  # Shuffle to mix up the task types
-    def transform_list_to_dict(list_of_dicts):
-        result = {}
-        keys = list_of_dicts[0].keys()
-        for key in keys:
-            result[key] = [item[key] for item in list_of_dicts]
+    Yields:
+        Generated data samples
+    """
+    random.seed(seed)
+    # The buffer draws from its own generator so that the samples do not depend on its size
+    rng = random.Random(f"{seed}:shuffle")
+    yield from mix_tasks(counts, TASK_GENERATORS, shuffle_buffer, rng, spec=spec)
+
+def generate_robotic_data(output_dir, task_counts, shard_size=10000, seed=0, resume=False, spec=DEFAULT_GRID,
+                          shuffle_buffer=DEFAULT_SHUFFLE_BUFFER):
+    """
+    Generate the dataset as checksummed JSONL shards recorded in a manifest.
+    
+    Every completed shard is written atomically and added to the manifest right
+    away, so with resume=True a rerun only regenerates the missing shards.
+    
+    Episodes have their own columns, so they cannot share shards with the
+    single-task samples; generate them into a separate output directory.
+    
+    Args:
+        output_dir: Directory for the shards and manifest
+        task_counts: Dictionary mapping task name to total number of samples
+        shard_size: Target number of samples per shard
+        seed: Base seed; each shard derives its own seed from it
+        resume: Skip shards already completed by a previous run
+        spec: The workspace grid spec
+        shuffle_buffer: Size of the shuffle buffer mixing the task types
         
-        return result
-    dict_format = transform_list_to_dict(data_samples)
-    dataset = Dataset.from_dict(dict_format)
-    dataset.push_to_hub("jan-hq/Pick-Place-Table-Reasoning-local-pos-v0.2", split="train")
-    return data_samples
+    Returns:
+        The manifest dictionary
+    """
+    if task_counts.get("episode") and any(count for task, count in task_counts.items() if task != "episode"):
+        raise ValueError("Episodes have a different schema than single-task samples; generate them into their own output directory")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if manifest is not None and resume:
+        check_resumable(manifest, task_counts, shard_size, seed, spec, shuffle_buffer)
+    else:
+        manifest = new_manifest(task_counts, shard_size, seed, spec, shuffle_buffer)
+        save_manifest(output_dir, manifest)
+    
+    shard_plan = plan_shards(task_counts, shard_size)
+    for index, counts in enumerate(shard_plan):
+        key = f"{index:05d}"
+        if resume and shard_is_complete(output_dir, manifest["shards"].get(key)):
+            print(f"Skipping completed shard {index + 1}/{len(shard_plan)}")
+            continue
+        manifest["shards"].pop(key, None)
+        shard_seed_value = shard_seed(seed, index)
+        entry = write_shard(output_dir, index, generate_shard(counts, shard_seed_value, spec, shuffle_buffer))
+        entry["seed"] = shard_seed_value
+        entry["counts"] = counts
+        manifest["shards"][key] = entry
+        save_manifest(output_dir, manifest)
+        print(f"Wrote shard {index + 1}/{len(shard_plan)} ({entry['num_samples']} samples)")
+    return manifest
 
 def main():
     parser = argparse.ArgumentParser(description='Generate synthetic robotic task data.')
     parser.add_argument('--placing', type=int, default=100000, help='Number of placing task samples')
     parser.add_argument('--stacking', type=int, default=120000, help='Number of stacking task samples')
     parser.add_argument('--moving', type=int, default=40000, help='Number of stacking task samples')
-    parser.add_argument('--output', type=str, default='synthetic_robotic_data.json', help='Output file name')
+    parser.add_argument('--unique-placing', type=int, default=70000, help='Number of placing task samples with unique objects')
+    parser.add_argument('--unique-stacking', type=int, default=30000, help='Number of stacking task samples with unique objects')
+    parser.add_argument('--episodes', type=int, default=0, help='Number of multi-step episodes (2-4 tasks on one scene)')
+    parser.add_argument('--output-dir', type=str, default='synthetic_robotic_data', help='Output directory for the shards and manifest')
+    parser.add_argument('--episodes-dir', type=str, default=None, help='Output directory for the episode shards (default: <output-dir>_episodes)')
+    parser.add_argument('--shard-size', type=int, default=10000, help='Number of samples per shard')
+    parser.add_argument('--seed', type=int, default=0, help='Base random seed')
+    parser.add_argument('--resume', action='store_true', help='Skip shards completed by a previous run')
+    parser.add_argument('--shuffle-buffer', type=int, default=DEFAULT_SHUFFLE_BUFFER, help='Samples held in memory to mix the task types')
+    parser.add_argument('--workspace', type=int, default=100, help='Workspace resolution (workspace x workspace)')
+    parser.add_argument('--grid-size', type=int, default=25, help='Global grid resolution; must divide --workspace')
     
     args = parser.parse_args()
+    spec = GridSpec(args.workspace, args.grid_size).validate()
     
-    data_samples = generate_robotic_data(args.placing, args.stacking, args.moving)
+    task_counts = build_task_counts(args.placing, args.stacking, args.moving, args.unique_placing, args.unique_stacking)
+    manifest = generate_robotic_data(args.output_dir, task_counts, args.shard_size, args.seed, args.resume, spec,
+                                     args.shuffle_buffer)
     
-    print(f"Generated {len(data_samples)} synthetic robotic data samples")
-    print(f" - Placing tasks: {args.placing}")
-    print(f" - Stacking tasks: {args.stacking}")
+    total = sum(entry["num_samples"] for entry in manifest["shards"].values())
+    print(f"Generated {total} synthetic robotic data samples in {len(manifest['shards'])} shards")
+    for task, count in task_counts.items():
+        print(f" - {task} tasks: {count}")
     
-    print("\nSample task:")
-    print(json.dumps(data_samples[0], indent=2))
+    if manifest["shards"]:
+        first_entry = manifest["shards"][min(manifest["shards"])]
+        print("\nSample task:")
+        print(json.dumps(next(iter_shard(args.output_dir, first_entry)), indent=2))
     
-    with open(args.output, 'w') as f:
-        json.dump(data_samples, f, indent=2)
+    print(f"\nAll shards saved to '{args.output_dir}'")
+    print(f"Upload them with: python shards.py --output-dir {args.output_dir} --repo-id {DEFAULT_REPO_ID}")
     
-    print(f"\nAll samples saved to '{args.output}'")
+    if args.episodes:
+        # Multi-turn rows have their own schema and go to their own dataset
+        episodes_dir = args.episodes_dir or f"{args.output_dir}_episodes"
+        episode_manifest = generate_robotic_data(episodes_dir, {"episode": args.episodes}, args.shard_size, args.seed,
+                                                 args.resume, spec, args.shuffle_buffer)
+        print(f"\nGenerated {args.episodes} episodes in {len(episode_manifest['shards'])} shards saved to '{episodes_dir}'")
+        print(f"Upload them to their own dataset with: python shards.py --output-dir {episodes_dir} --repo-id {DEFAULT_REPO_ID}-episodes")
     
 
 if __name__ == "__main__":
@@ -458,7 +717,7 @@ if __name__ == "__main__":
     {"purple-cube": [27, 29, 18]},
     {"blue-container": [76, 65, 17]},
     {"purple-triangular prism": [51, 55, 18]},
-    {"orange-star": [57, 65, 17]}
+    {"yellow-star": [57, 65, 17]}
     ]
 
     tokenized_output, object_height = tokenize_desk(objects)
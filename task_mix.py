@@ -0,0 +1,78 @@
+import random
+
+DEFAULT_SHUFFLE_BUFFER = 1000
+
+
+def interleave_tasks(counts):
+    """
+    Yield task names so that every task appears exactly counts[task] times and
+    every prefix of the stream follows the target ratios as closely as possible.
+
+    At each step the task furthest behind its share of the samples emitted so
+    far is picked, ties going to the task listed first.
+
+    Args:
+        counts: Dictionary mapping task name to number of samples
+
+    Yields:
+        Task names
+    """
+    total = sum(counts.values())
+    emitted = dict.fromkeys(counts, 0)
+    for step in range(1, total + 1):
+        # Deficit of each task, scaled by total to stay in integers
+        task = max(
+            (task for task in counts if emitted[task] < counts[task]),
+            key=lambda task: counts[task] * step - emitted[task] * total,
+        )
+        emitted[task] += 1
+        yield task
+
+
+def shuffle_buffer(items, buffer_size, rng=random):
+    """
+    Shuffle a stream while holding at most buffer_size items in memory.
+
+    The buffer is filled first; after that every incoming item replaces a
+    randomly chosen buffered item, which is yielded. A buffer larger than the
+    stream is a full shuffle, a buffer of 1 or less keeps the stream order.
+
+    Args:
+        items: Iterable of items
+        buffer_size: Maximum number of buffered items
+        rng: Random number generator to draw positions from
+
+    Yields:
+        The items in shuffled order
+    """
+    if buffer_size <= 1:
+        yield from items
+        return
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        index = rng.randrange(buffer_size)
+        yield buffer[index]
+        buffer[index] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def mix_tasks(counts, generators, buffer_size=DEFAULT_SHUFFLE_BUFFER, rng=random, **kwargs):
+    """
+    Stream samples of several task types with exact quotas.
+
+    Args:
+        counts: Dictionary mapping task name to number of samples
+        generators: Dictionary mapping task name to a function producing one sample
+        buffer_size: Size of the shuffle buffer decorrelating nearby samples
+        rng: Random number generator for the shuffle buffer
+        **kwargs: Passed to every generator call
+
+    Yields:
+        Generated samples
+    """
+    samples = (generators[task](**kwargs) for task in interleave_tasks(counts))
+    yield from shuffle_buffer(samples, buffer_size, rng)
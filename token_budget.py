@@ -0,0 +1,239 @@
+"""
+Check the special-token vocabulary against a tokenizer and report the prompt token budget.
+
+The prompt format relies on every <|row-col|>, <|local-row-col|>, <|color|>
+and <|object|> token being a single token. This tool builds the full
+vocabulary from the colors, objects and grid spec, checks that each entry
+encodes to exactly one token id, and reports per-section token counts over
+generated samples, generated multi-step episodes or existing shards.
+
+    python token_budget.py --tokenizer jan-hq/AlphaTable-1.5B --samples 2000
+    python token_budget.py --tokenizer jan-hq/AlphaTable-1.5B --episodes --samples 500
+    python token_budget.py --tokenizer ./tokenizer --data-dir synthetic_robotic_data
+    python token_budget.py --write-vocab special_tokens.txt
+
+Exits with status 1 if a vocabulary token splits into several pieces, the
+data uses <|...|> tokens missing from the vocabulary, or a sample is longer
+than --cutoff-len.
+"""
+import re
+import sys
+import random
+import argparse
+import itertools
+from collections import Counter
+
+from shards import iter_shard, load_manifest
+from task_mix import mix_tasks
+from utils import colors, objects
+from service.grid import DEFAULT_GRID, EMPTY_TOKEN, GridSpec
+
+# Tags that delimit prompt sections; reported, but their splitting is not a failure
+TAG_TOKENS = ["<desk>", "</desk>", "<desk-update>", "</desk-update>", "<think>", "</think>"]
+SECTIONS = ["static", "instruction", "heights", "desk", "followup", "think", "actions"]
+SPECIAL_TOKEN_PATTERN = re.compile(r"<\|[^|]+\|>")
+
+
+def build_vocabulary(spec=DEFAULT_GRID):
+    """
+    Build the special tokens the prompt format relies on, grouped by kind.
+
+    Args:
+        spec: The workspace grid spec
+
+    Returns:
+        Dictionary mapping group name to list of tokens
+    """
+    cells = range(spec.grid_size)
+    local_cells = range(spec.local_size)
+    return {
+        "global": [f"<|{row}-{col}|>" for row, col in itertools.product(cells, cells)],
+        "local": [f"<|local-{row}-{col}|>" for row, col in itertools.product(local_cells, local_cells)],
+        "color": [f"<|{color}|>" for color in colors],
+        "object": [f"<|{obj}|>" for obj in objects + ["container"]],
+        "state": [EMPTY_TOKEN],
+    }
+
+
+def load_tokenizer(name_or_path):
+    """Load a Hugging Face tokenizer from the Hub or a local directory."""
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError("--tokenizer needs the transformers package: pip install transformers") from None
+    return AutoTokenizer.from_pretrained(name_or_path)
+
+
+def split_tokens(tokenizer, tokens):
+    """Return {token: pieces} for every token that does not encode to a single id."""
+    split = {}
+    for token in tokens:
+        ids = tokenizer.encode(token, add_special_tokens=False)
+        if len(ids) != 1:
+            split[token] = tokenizer.convert_ids_to_tokens(ids)
+    return split
+
+
+def prompt_sections(sample):
+    """
+    Split the conversation of a sample into the sections of the prompt format.
+
+    Returns:
+        Dictionary mapping section name to its text; "static" is everything
+        in the first user turn outside the instruction, heights and desk,
+        "followup" holds the later user turns of a multi-step episode, and
+        "think" and "actions" cover every assistant turn
+    """
+    conversation = sample["Conversation"]
+    user = conversation[0]["content"]
+    desk_start = user.index("<desk>")
+    desk_end = user.index("</desk>") + len("</desk>")
+    heights = re.search(r"The height of each object: (.*)\n", user).group(1)
+    instruction = re.search(r"\nTASK: (.*)\n", user).group(1)
+    think, actions = [], []
+    for message in conversation[1::2]:
+        assistant = message["content"]
+        think_end = assistant.index("</think>") + len("</think>")
+        think.append(assistant[:think_end])
+        actions.append(assistant[think_end:])
+    return {
+        "static": user[:desk_start].replace(heights, "", 1).replace(instruction, "", 1) + user[desk_end:],
+        "instruction": instruction,
+        "heights": heights,
+        "desk": user[desk_start:desk_end],
+        "followup": "\n".join(message["content"] for message in conversation[2::2]),
+        "think": "\n".join(think),
+        "actions": "\n".join(actions),
+    }
+
+
+def generate_samples(num_samples, spec=DEFAULT_GRID, seed=0):
+    """Generate samples with the default task mix of synthetic_data_pick_place."""
+    from synthetic_data_pick_place import TASK_GENERATORS, build_task_counts
+
+    defaults = build_task_counts(100000, 120000, 40000, 70000, 30000)
+    total = sum(defaults.values())
+    counts = {task: count * num_samples // total for task, count in defaults.items()}
+    counts["placing"] += num_samples - sum(counts.values())
+    random.seed(seed)
+    return mix_tasks(counts, TASK_GENERATORS, spec=spec)
+
+
+def generate_episodes(num_samples, spec=DEFAULT_GRID, seed=0):
+    """Generate multi-step episodes of synthetic_data_pick_place."""
+    from synthetic_data_pick_place import TASK_GENERATORS
+
+    random.seed(seed)
+    return mix_tasks({"episode": num_samples}, TASK_GENERATORS, spec=spec)
+
+
+def iter_dataset(data_dir, limit=None):
+    manifest = load_manifest(data_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No manifest found in {data_dir}")
+    samples = itertools.chain.from_iterable(iter_shard(data_dir, manifest["shards"][key]) for key in sorted(manifest["shards"]))
+    return itertools.islice(samples, limit)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def section_report(tokenizer, samples, cutoff_len):
+    """
+    Count tokens per section over the samples and print a summary table.
+
+    Returns:
+        Dictionary mapping section name (and "total") to the sorted counts;
+        sections a sample does not have (e.g. "followup") count as 0
+    """
+    counts = {section: [] for section in SECTIONS + ["total"]}
+    for sample in samples:
+        total = 0
+        for section, text in prompt_sections(sample).items():
+            count = len(tokenizer.encode(text, add_special_tokens=False))
+            counts[section].append(count)
+            total += count
+        counts["total"].append(total)
+    for values in counts.values():
+        values.sort()
+
+    num_samples = len(counts["total"])
+    print(f"\nToken counts over {num_samples} samples (chat template overhead excluded):")
+    print(f"{'section':>12} {'mean':>8} {'p50':>6} {'p95':>6} {'max':>6}")
+    for section, values in counts.items():
+        print(f"{section:>12} {sum(values) / num_samples:>8.1f} {percentile(values, 0.5):>6} "
+              f"{percentile(values, 0.95):>6} {values[-1]:>6}")
+    over = sum(1 for total in counts["total"] if total > cutoff_len)
+    print(f"Samples over cutoff_len={cutoff_len}: {over} ({over / num_samples:.2%})")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the special-token vocabulary and report prompt token counts.')
+    parser.add_argument('--tokenizer', type=str, default=None, help='Tokenizer name or local path (needs transformers)')
+    parser.add_argument('--data-dir', type=str, default=None, help='Shard directory to analyze instead of generated samples')
+    parser.add_argument('--samples', type=int, default=1000, help='Number of samples to analyze')
+    parser.add_argument('--episodes', action='store_true', help='Analyze generated multi-step episodes instead of single tasks')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for generated samples')
+    parser.add_argument('--cutoff-len', type=int, default=4096, help='Training cutoff_len to compare totals against')
+    parser.add_argument('--workspace', type=int, default=100, help='Workspace resolution (workspace x workspace)')
+    parser.add_argument('--grid-size', type=int, default=25, help='Global grid resolution; must divide --workspace')
+    parser.add_argument('--write-vocab', type=str, default=None, help='Write the vocabulary to this file, one token per line')
+    args = parser.parse_args()
+    spec = GridSpec(args.workspace, args.grid_size).validate()
+
+    vocabulary = build_vocabulary(spec)
+    all_tokens = [token for tokens in vocabulary.values() for token in tokens]
+    print(f"Special-token vocabulary for a {spec.workspace}x{spec.workspace} workspace, {spec.grid_size}x{spec.grid_size} grid: {len(all_tokens)} tokens")
+    for group, tokens in vocabulary.items():
+        print(f" - {group}: {len(tokens)}")
+    if args.write_vocab:
+        with open(args.write_vocab, "w") as f:
+            f.write("".join(token + "\n" for token in all_tokens))
+        print(f"Wrote vocabulary to {args.write_vocab}")
+
+    failed = False
+    if args.data_dir:
+        samples = list(iter_dataset(args.data_dir, args.samples))
+    elif args.episodes:
+        samples = list(generate_episodes(args.samples, spec, args.seed))
+    else:
+        samples = list(generate_samples(args.samples, spec, args.seed))
+    known = set(all_tokens)
+    # The static text names the token kinds (<|row-col|> etc.), so only the generated sections are scanned
+    unknown = Counter(
+        token
+        for sample in samples
+        for section, text in prompt_sections(sample).items() if section != "static"
+        for token in SPECIAL_TOKEN_PATTERN.findall(text)
+        if token not in known
+    )
+    if unknown:
+        failed = True
+        print(f"\nFAIL: {len(unknown)} special tokens in the data are not in the vocabulary:")
+        for token, count in unknown.most_common(20):
+            print(f"   {token} ({count} uses)")
+
+    if args.tokenizer:
+        tokenizer = load_tokenizer(args.tokenizer)
+        split = split_tokens(tokenizer, all_tokens)
+        if split:
+            failed = True
+            print(f"\nFAIL: {len(split)} vocabulary tokens are not single tokens in {args.tokenizer}:")
+            for token, pieces in itertools.islice(split.items(), 20):
+                print(f"   {token} -> {pieces}")
+        else:
+            print(f"\nAll {len(all_tokens)} vocabulary tokens are single tokens in {args.tokenizer}")
+        for token, pieces in split_tokens(tokenizer, TAG_TOKENS).items():
+            print(f"Note: tag {token} splits into {pieces}")
+        counts = section_report(tokenizer, samples, args.cutoff_len)
+        if counts["total"][-1] > args.cutoff_len:
+            failed = True
+            print(f"\nFAIL: the longest sample has {counts['total'][-1]} tokens, more than cutoff_len={args.cutoff_len}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()